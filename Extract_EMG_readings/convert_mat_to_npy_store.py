@@ -0,0 +1,73 @@
+import os
+from tkinter import Tk
+from tkinter.filedialog import askdirectory
+
+from Process_EMG_data.helpers.amplifier_config import sampling_frequency
+from Process_EMG_data.helpers.compact_recording import compress_recording
+from Process_EMG_data.helpers.recording_reader import load_recording
+from Process_EMG_data.helpers.recording_store import (
+    read_store_metadata,
+    write_stored_recording,
+)
+from Process_EMG_data.helpers.utilis import (
+    get_channel_names,
+    get_mat_filenames,
+    parse_recording_filename,
+)
+
+# Set to "int16" or "float32" to store the recordings in compact form (see `compact_recording`),
+# or to None to keep the float64 samples of the .mat files
+storage_dtype = None
+
+
+def convert_directory(directory_path, overwrite=False, dtype=None):
+    """
+    Convert all the .mat recordings of a directory to the native recording store.
+
+    Each recording is saved as a contiguous .npy file with a JSON metadata sidecar in the `npy_store` folder of the
+    directory. Recordings that were already converted, and whose .mat file did not change since, are skipped.
+
+    Args:
+        directory_path (str): Path to the directory containing the .mat files.
+        overwrite (bool, optional): If True, converts again the recordings that are already up to date. Default is False.
+        dtype (str, optional): "int16" or "float32" to store the recordings in compact form. Default is the type of the .mat data.
+
+    Returns:
+        int: Number of converted recordings.
+    """
+    try:
+        channel_names = get_channel_names(directory_path)
+    except OSError:
+        channel_names = None
+
+    num_converted = 0
+    for mat_path in get_mat_filenames(directory_path):
+        if not overwrite and read_store_metadata(mat_path) is not None:
+            continue
+
+        metadata = {
+            "sampling_frequency": sampling_frequency,
+            "channel_names": channel_names,
+        }
+        try:
+            metadata.update(parse_recording_filename(mat_path)._asdict())
+        except ValueError:
+            pass
+
+        data = load_recording(mat_path, use_store=False)
+        if dtype is not None:
+            data = compress_recording(data, dtype)
+        write_stored_recording(mat_path, data, metadata)
+        num_converted += 1
+        print(f"Converted {os.path.basename(mat_path)}")
+
+    return num_converted
+
+
+if __name__ == "__main__":
+    Tk().withdraw()  # to hide the small tk window
+
+    directory_path = askdirectory(title="Select the folder with the .mat files")
+    if directory_path:
+        num_converted = convert_directory(directory_path, dtype=storage_dtype)
+        print(f"{num_converted} recordings converted in {directory_path}")
@@ -1,38 +1,21 @@
 import os
-import re
 import numpy as np
 from scipy.io import loadmat, savemat
 from tkinter import filedialog, Tk
 
+from Process_EMG_data.helpers.utilis import parse_recording_filename
+
 
 def get_exercise_name(filename):
     """
     Extracts the exercise name (including the repetition) from the filename.
     """
-    filename = os.path.basename(filename)
-    match = re.search(r"\d{2}_\d{2}_\d{4}", filename)
-    if match:
-        parts = filename.split(match.group())
-        yoga_position = "_".join(parts[0].split("_")[1:-1]).rstrip("_")
-        rep = get_repetition(filename)
-        return f"{yoga_position}_{rep}"
-
-    raise ValueError(
-        f"Could not find the expected date pattern in the filename. Filename is {filename}"
-    )
-
-
-def get_repetition(filename):
-    """
-    Extracts the repetition from the filename.
-    """
-    match = re.search(r"rep\d+", filename)
-    if match:
-        return match.group()
-    else:
+    info = parse_recording_filename(filename)
+    if info.rep is None:
         raise ValueError(
             f"Could not find the expected repetition pattern in the filename. Filename is {filename}"
         )
+    return f"{info.exercise_name}_rep{info.rep}"
 
 
 def merge_files(directory1, directory2, save_directory):
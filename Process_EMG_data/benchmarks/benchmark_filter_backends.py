@@ -0,0 +1,136 @@
+import time
+
+import numpy as np
+from scipy.signal import freqz, sosfreqz
+
+from Process_EMG_data.helpers.amplifier_config import (
+    sampling_frequency,
+    lowcut,
+    highcut,
+    mains_frequency,
+)
+from Process_EMG_data.helpers.filtering import (
+    filter_bank,
+    butter_bandpass_filter,
+    notch_mains_interference,
+    fir_bandpass_notch_filter,
+)
+from Process_EMG_data.helpers.apply_processing_pipeline import extract_envelope
+
+
+def compare_frequency_responses(num_points=16385):
+    """
+    Compare the magnitude responses of the IIR and FIR bandpass + notch filters.
+
+    Args:
+        num_points (int, optional): Number of frequencies between 0 Hz and the Nyquist frequency. Default is 16385.
+
+    Returns:
+        dict: Maximum and RMS magnitude error, and the attenuation (in dB) at the mains frequency for both filters.
+    """
+    frequencies = np.linspace(0, 0.5 * sampling_frequency, num_points)
+    iir_sos = np.vstack(
+        [
+            filter_bank.bandpass(lowcut, highcut, sampling_frequency),
+            filter_bank.notch(mains_frequency, sampling_frequency),
+        ]
+    )
+    fir_taps = filter_bank.fir_bandpass(lowcut, highcut, sampling_frequency)
+    _, iir_response = sosfreqz(iir_sos, worN=frequencies, fs=sampling_frequency)
+    _, fir_response = freqz(fir_taps, worN=frequencies, fs=sampling_frequency)
+    # The FIR backend applies the IIR notch after the FIR bandpass
+    _, notch_response = sosfreqz(
+        filter_bank.notch(mains_frequency, sampling_frequency),
+        worN=frequencies,
+        fs=sampling_frequency,
+    )
+    fir_response = fir_response * notch_response
+
+    magnitude_error = np.abs(np.abs(fir_response) - np.abs(iir_response))
+    mains_index = np.argmin(np.abs(frequencies - mains_frequency))
+    return {
+        "max_error": magnitude_error.max(),
+        "rms_error": np.sqrt(np.mean(magnitude_error**2)),
+        "iir_mains_attenuation_db": 20 * np.log10(np.abs(iir_response[mains_index])),
+        "fir_mains_attenuation_db": 20 * np.log10(np.abs(fir_response[mains_index])),
+    }
+
+
+def time_function(function, repeats=3):
+    """
+    Return the best wall time (in seconds) over a number of calls of a function.
+
+    Args:
+        function (callable): Function to be timed, called without arguments.
+        repeats (int, optional): Number of calls. Default is 3.
+
+    Returns:
+        float: Best wall time in seconds.
+    """
+    best_time = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return best_time
+
+
+def benchmark_backends(num_channels=64, duration_minutes=3, seed=0):
+    """
+    Time the IIR and FIR backends on a synthetic multichannel recording.
+
+    Args:
+        num_channels (int, optional): Number of channels of the recording. Default is 64.
+        duration_minutes (float, optional): Duration of the recording in minutes. Default is 3.
+        seed (int, optional): Seed of the random generator. Default is 0.
+
+    Returns:
+        dict: Wall times of the filtering and envelope stages for both backends, and the relative difference between the envelopes.
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration_minutes * 60 * sampling_frequency)
+    data = rng.standard_normal((num_channels, num_samples))
+
+    def iir_filtering():
+        filtered_data = butter_bandpass_filter(
+            data, lowcut, highcut, sampling_frequency
+        )
+        return notch_mains_interference(
+            filtered_data, mains_frequency, sampling_frequency
+        )
+
+    def fir_filtering():
+        return fir_bandpass_notch_filter(
+            data, lowcut, highcut, mains_frequency, sampling_frequency
+        )
+
+    iir_envelope = extract_envelope(data, sampling_frequency, backend="iir")
+    fir_envelope = extract_envelope(data, sampling_frequency, backend="fir")
+
+    return {
+        "iir_filtering_s": time_function(iir_filtering),
+        "fir_filtering_s": time_function(fir_filtering),
+        "iir_envelope_s": time_function(
+            lambda: extract_envelope(data, sampling_frequency, backend="iir")
+        ),
+        "fir_envelope_s": time_function(
+            lambda: extract_envelope(data, sampling_frequency, backend="fir")
+        ),
+        "envelope_mean_relative_difference": np.max(
+            np.abs(fir_envelope.mean(axis=-1) - iir_envelope.mean(axis=-1))
+            / iir_envelope.mean(axis=-1)
+        ),
+    }
+
+
+if __name__ == "__main__":
+    print("Frequency response of the FIR backend compared with the IIR filters:")
+    for name, value in compare_frequency_responses().items():
+        print(f"  {name}: {value:.4f}")
+
+    num_channels = int(input("Enter the number of channels: "))
+    duration_minutes = float(input("Enter the duration of the recording (minutes): "))
+
+    print(f"\nTimings for {num_channels} channels, {duration_minutes} minutes:")
+    for name, value in benchmark_backends(num_channels, duration_minutes).items():
+        print(f"  {name}: {value:.4f}")
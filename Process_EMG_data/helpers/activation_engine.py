@@ -0,0 +1,247 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from Process_EMG_data.helpers.activation_statistics import (
+    compute_activation_statistics,
+)
+from Process_EMG_data.helpers.amplifier_config import sampling_frequency
+from Process_EMG_data.helpers.apply_processing_pipeline import normalize_envelope
+from Process_EMG_data.helpers.envelope_cache import get_default_cache
+from Process_EMG_data.helpers.prefetch import prefetch_map
+from Process_EMG_data.helpers.utilis import get_exercise_name, get_rep_number
+
+
+def _call_with_worker_cache(filepath, function, cache):
+    """
+    Apply a function to a recording in a worker process.
+
+    Returns:
+        tuple: The result of the function, and the hash entry of the recording computed by the worker cache.
+    """
+    return function(filepath, cache), cache.get_file_hash_entry(filepath)
+
+
+def map_recordings(function, filepaths, cache, max_workers=None):
+    """
+    Apply a function to each recording on a process pool, yielding the results in the order of `filepaths`.
+
+    The function and its results are sent between processes, so they should be small: large arrays are passed
+    through the envelope cache, which workers write and the caller reads back as memory maps.
+
+    Workers receive a copy of the cache that does not write the table of file hashes, since they would overwrite
+    each other's entries: the hashes they compute are sent back and saved once, when the iteration ends.
+
+    Args:
+        function (callable): Picklable function taking the path to a recording and the envelope cache.
+        filepaths (list): Paths to the .mat recordings.
+        cache (EnvelopeCache): Envelope cache used by the function.
+        max_workers (int, optional): Number of worker processes. With 1 the recordings are processed in the current
+            process, loading the next ones in the background. Default is the number of CPUs.
+
+    Yields:
+        The result of the function for each recording.
+    """
+    filepaths = list(filepaths)
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(filepaths))
+
+    if max_workers <= 1:
+        for _, result in prefetch_map(partial(function, cache=cache), filepaths):
+            yield result
+        return
+
+    call = partial(
+        _call_with_worker_cache, function=function, cache=cache.worker_copy()
+    )
+    file_hash_entries = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for result, file_hash_entry in executor.map(call, filepaths):
+                if file_hash_entry is not None:
+                    file_hash_entries.append(file_hash_entry)
+                yield result
+    finally:
+        cache.update_file_hashes(file_hash_entries)
+
+
+def _reduce_recording(filepath, cache, channel_list, sampling_frequency, statistics):
+    """
+    Compute the activation statistics of the selected channels of a single recording.
+
+    Returns:
+        dict: Dictionary mapping each statistic name to its value per selected channel.
+    """
+    envelope = cache.get_envelope(filepath, sampling_frequency)
+    return compute_activation_statistics(envelope[channel_list, :], statistics)
+
+
+def _prepare_envelope(filepath, cache, sampling_frequency):
+    """Store the envelope of a recording in the cache, returning its key."""
+    return cache.prepare(filepath, sampling_frequency)
+
+
+def _check_rep_order(filenames):
+    """Print an error for each recording that is not in increasing rep order within its exercise."""
+    last_rep_for_exercise = defaultdict(int)
+    for filename in filenames:
+        exercise_name = get_exercise_name(os.path.basename(filename))
+        current_rep = get_rep_number(filename)
+        if current_rep <= last_rep_for_exercise[exercise_name]:
+            print(f"Error: {filename} is out of order for {exercise_name}")
+        last_rep_for_exercise[exercise_name] = current_rep
+
+
+def reduce_exercise_activations(
+    filenames,
+    channel_indices,
+    sampling_frequency,
+    statistics=("mean",),
+    max_workers=None,
+    cache=None,
+):
+    """
+    Process the recordings on a process pool, keeping only summary statistics.
+
+    Each worker computes the envelope of one recording at a time (reusing the envelope cache) and sends back
+    one value per channel and statistic, so memory grows with the number of reps and channels, not with the
+    recording length. The results are assembled in the order of `filenames`, so they do not depend on the
+    number of workers.
+
+    The statistics are not normalized: since normalization is linear, the MVC scaling is applied
+    afterwards with `apply_mvc_normalization`, so switching between MVC strategies does not require
+    processing the recordings again.
+
+    Args:
+        filenames (list): List of filenames containing the EMG data, in rep order.
+        channel_indices (list): Indices of the channels to be processed.
+        sampling_frequency (int): The sampling frequency of the signal.
+        statistics (iterable, optional): Names of the statistics, see `compute_activation_statistics`. Default is ("mean",).
+        max_workers (int, optional): Number of worker processes, see `map_recordings`. Default is the number of CPUs.
+        cache (EnvelopeCache, optional): Cache to use. Default is the shared cache.
+
+    Returns:
+        dict: Dictionary mapping each statistic name to a dictionary of exercise names to a list (one per selected channel,
+        in the order of `channel_indices`) of per-rep values, i.e. `result[statistic][exercise_name][row][rep_index]`.
+    """
+    if cache is None:
+        cache = get_default_cache()
+    filenames = list(filenames)
+    statistics = list(statistics)
+    channel_list = list(channel_indices)
+    results = {
+        name: defaultdict(lambda: [list() for _ in channel_indices])
+        for name in statistics
+    }
+
+    reduce_recording = partial(
+        _reduce_recording,
+        channel_list=channel_list,
+        sampling_frequency=sampling_frequency,
+        statistics=statistics,
+    )
+    recording_values = map_recordings(reduce_recording, filenames, cache, max_workers)
+    for filename, values in zip(filenames, recording_values):
+        exercise_name = get_exercise_name(os.path.basename(filename))
+        for name in statistics:
+            for row in range(len(channel_list)):
+                results[name][exercise_name][row].append(float(values[name][row]))
+
+    return results
+
+
+def iter_envelopes_in_parallel(
+    filenames, sampling_frequency, max_workers=None, cache=None
+):
+    """
+    Iterate over the envelopes of several recordings, computing them on a process pool.
+
+    Workers only store the envelopes in the envelope cache and send back their key; the envelopes are then
+    opened as read-only memory maps, so they are never pickled between processes.
+
+    Args:
+        filenames (list): Paths to the .mat recordings.
+        sampling_frequency (int): The sampling frequency of the signal.
+        max_workers (int, optional): Number of worker processes, see `map_recordings`. Default is the number of CPUs.
+        cache (EnvelopeCache, optional): Cache to use. Default is the shared cache.
+
+    Yields:
+        tuple: The path and the (channels, samples) envelope of each recording, in the order of `filenames`.
+    """
+    if cache is None:
+        cache = get_default_cache()
+    filenames = list(filenames)
+
+    prepare = partial(_prepare_envelope, sampling_frequency=sampling_frequency)
+    for filename, key in zip(
+        filenames, map_recordings(prepare, filenames, cache, max_workers)
+    ):
+        envelope = cache.load(key)
+        if envelope is None:
+            # The envelope was evicted from the cache in the meantime
+            envelope = cache.get_envelope(filename, sampling_frequency)
+        yield filename, envelope
+
+
+def compute_exercise_activations(
+    filenames, channel_indices, max_workers=None, check_rep_order=False
+):
+    """
+    Compute the mean activation of each rep of each exercise, using all the CPUs.
+
+    Only the mean activation of each rep is used, so the signals are never stored. The activations are not
+    normalized, so that the MVC strategy can be changed without processing the files again: normalize them
+    with `apply_mvc_normalization`.
+
+    Args:
+        filenames (list): List of filenames containing the EMG data, in rep order.
+        channel_indices (list): Indices of the channels to be processed.
+        max_workers (int, optional): Number of worker processes, see `map_recordings`. Default is the number of CPUs.
+        check_rep_order (bool, optional): If True, prints an error for the recordings that are not in rep order. Default is False.
+
+    Returns:
+        dict: Dictionary of exercise names to a list (one per selected channel, in the order of `channel_indices`) of per-rep
+        mean activations.
+    """
+    if check_rep_order:
+        _check_rep_order(filenames)
+    return reduce_exercise_activations(
+        filenames, channel_indices, sampling_frequency, max_workers=max_workers
+    )["mean"]
+
+
+def compute_exercise_envelopes(
+    filenames, channel_indices, mvc_values=None, max_workers=None
+):
+    """
+    Collect the envelope of each rep of each exercise, computing the envelopes on all the CPUs.
+
+    Args:
+        filenames (list): List of filenames containing the EMG data, in rep order.
+        channel_indices (list): Indices of the channels to be kept.
+        mvc_values (list, optional): MVC values of all the channels, used to normalize the envelopes. Default is no normalization.
+        max_workers (int, optional): Number of worker processes, see `map_recordings`. Default is the number of CPUs.
+
+    Returns:
+        dict: Dictionary of exercise names to a list (one per selected channel, in the order of `channel_indices`) of per-rep
+        envelopes.
+    """
+    channel_list = list(channel_indices)
+    envelopes_per_exercise = defaultdict(lambda: [list() for _ in channel_indices])
+
+    for filename, envelope in iter_envelopes_in_parallel(
+        filenames, sampling_frequency, max_workers
+    ):
+        exercise_name = get_exercise_name(os.path.basename(filename))
+        envelope = envelope[channel_list, :]
+        if mvc_values is not None:
+            envelope = normalize_envelope(
+                envelope, np.asarray(mvc_values)[channel_list]
+            )
+        for row in range(len(channel_list)):
+            envelopes_per_exercise[exercise_name][row].append(envelope[row])
+
+    return envelopes_per_exercise
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+def _mean(envelope, axis):
+    return np.mean(envelope, axis=axis)
+
+
+def _rms(envelope, axis):
+    return np.sqrt(np.mean(np.square(envelope), axis=axis))
+
+
+def _peak(envelope, axis):
+    return np.max(envelope, axis=axis)
+
+
+# Statistics that can be requested by name, in addition to percentiles ("p5", "p50", "p95", ...)
+statistic_functions = {
+    "mean": _mean,
+    "rms": _rms,
+    "peak": _peak,
+}
+
+
+def _parse_percentile(statistic):
+    """
+    Return the percentile requested by a statistic name of the form "p<q>", or None.
+
+    Args:
+        statistic (str): Name of the statistic (e.g. "p95").
+
+    Returns:
+        float or None: The percentile, between 0 and 100.
+    """
+    if not statistic.startswith("p") or statistic in statistic_functions:
+        return None
+    try:
+        percentile = float(statistic[1:])
+    except ValueError:
+        return None
+    return percentile if 0 <= percentile <= 100 else None
+
+
+def compute_activation_statistics(envelope, statistics=("mean",), mvc=None, axis=-1):
+    """
+    Reduce the envelope of each channel to summary statistics.
+
+    All the supported statistics scale linearly with the signal, so the statistics of the normalized
+    signal are obtained by dividing the statistics of the envelope by the MVC, without ever
+    materializing the normalized signal.
+
+    Args:
+        envelope (np.array): The envelope, either a single channel or a (channels, samples) array.
+        statistics (iterable, optional): Names of the statistics: "mean", "rms", "peak" or a percentile "p<q>" (e.g. "p95"). Default is ("mean",).
+        mvc (float or array, optional): MVC value(s) used for normalization, one per channel. Default is no normalization.
+        axis (int, optional): Time axis of the envelope. Default is -1.
+
+    Returns:
+        dict: Dictionary mapping each statistic name to its value per channel.
+    """
+    if mvc is not None:
+        mvc = np.asarray(mvc, dtype=float)
+        if np.any(mvc == 0):
+            raise ValueError(f"Error: Division by zero")
+
+    statistics = list(statistics)
+    percentile_names = [
+        name for name in statistics if _parse_percentile(name) is not None
+    ]
+    results = {}
+
+    # Compute all the percentiles with a single partial sort
+    if percentile_names:
+        percentiles = np.percentile(
+            envelope,
+            [_parse_percentile(name) for name in percentile_names],
+            axis=axis,
+        )
+        for name, values in zip(percentile_names, percentiles):
+            results[name] = values
+
+    for name in statistics:
+        if name in results:
+            continue
+        if name not in statistic_functions:
+            raise ValueError(
+                f"Unknown statistic {name}, expected one of {list(statistic_functions)} or a percentile like 'p95'"
+            )
+        results[name] = statistic_functions[name](envelope, axis)
+
+    if mvc is not None:
+        results = {name: values / mvc for name, values in results.items()}
+    return results
+
+
+def apply_mvc_normalization(activations_per_exercise, mvc_values, channel_indices=None):
+    """
+    Normalize unnormalized activation statistics by the MVC of each channel.
+
+    Args:
+        activations_per_exercise (dict): Dictionary of exercise names to a list (one per selected channel) of per-rep values,
+            as returned by `activation_engine.reduce_exercise_activations` for a single statistic.
+        mvc_values (list): MVC values of all the channels.
+        channel_indices (list, optional): Indices of the selected channels, in the order of the lists. Default is all the channels.
+
+    Returns:
+        dict: Dictionary with the same structure containing the normalized values. The input is left unchanged.
+    """
+    mvc_values = np.asarray(mvc_values, dtype=float)
+    if np.any(mvc_values == 0):
+        raise ValueError(f"Error: Division by zero")
+
+    if channel_indices is not None:
+        mvc_values = mvc_values[list(channel_indices)]
+
+    return {
+        exercise_name: [
+            [value / mvc_values[row] for value in reps]
+            for row, reps in enumerate(activations)
+        ]
+        for exercise_name, activations in activations_per_exercise.items()
+    }
@@ -0,0 +1,247 @@
+import numpy as np
+import pandas as pd
+
+from Process_EMG_data.helpers.recording_catalog import get_participant_group
+
+# Names of the axes of the activation tensor, in order
+tensor_axes = ("exercise", "participant", "rep", "channel")
+
+
+class ActivationTensor:
+    """
+    Activations of a study stored as a dense (exercise, participant, rep, channel) array.
+
+    Each exercise, participant and channel is identified by a label, and the reps by their position. Participants
+    can have different numbers of reps per exercise: missing reps are NaN in `values` and False in `mask`, so
+    reductions ignore them. Channels are matched by name, so participants whose channel configurations list the
+    channels in a different order are aligned.
+
+    Example:
+        tensor = ActivationTensor.from_participants(activations_by_participant, channel_names_by_participant)
+        yt_tensor = tensor.select(group="YT")
+        mean_per_channel = yt_tensor.mean(axis=("participant", "rep"))  # (exercise, channel)
+    """
+
+    def __init__(self, values, exercises, participants, channels, mask=None):
+        """
+        Args:
+            values (np.array): The (exercise, participant, rep, channel) activations, NaN for the missing reps.
+            exercises (list): Exercise names, one per index of the first axis.
+            participants (list): Participant labels (e.g. "YT1"), one per index of the second axis. Use the session
+                directory names (e.g. "YT1_testing_6_MAT") to keep several sessions of the same participant apart.
+            channels (list): Channel names, one per index of the last axis.
+            mask (np.array, optional): (exercise, participant, rep) array, True for the recorded reps.
+                Default is the reps with at least one value.
+        """
+        self.values = np.asarray(values, dtype=float)
+        if self.values.ndim != len(tensor_axes):
+            raise ValueError(
+                f"Error: expected a {tensor_axes} array, got shape {self.values.shape}"
+            )
+        if mask is None:
+            mask = ~np.all(np.isnan(self.values), axis=-1)
+        self.mask = np.asarray(mask, dtype=bool)
+        self.exercises = list(exercises)
+        self.participants = list(participants)
+        self.channels = list(channels)
+
+    @classmethod
+    def from_participants(
+        cls, activations_by_participant, channel_names_by_participant
+    ):
+        """
+        Build the tensor from the activations of each participant.
+
+        Args:
+            activations_by_participant (dict): Participant labels to the activations of the participant, a dictionary of
+                exercise names to a list (one per channel) of per-rep values, as returned by `compute_exercise_activations`.
+            channel_names_by_participant (dict): Participant labels to the channel names of the participant.
+
+        Returns:
+            ActivationTensor: The tensor, with the exercises in order of appearance and the channels sorted by name.
+        """
+        participants = list(activations_by_participant)
+        exercises = list(
+            dict.fromkeys(
+                exercise_name
+                for activations in activations_by_participant.values()
+                for exercise_name in activations
+            )
+        )
+        channels = sorted(
+            set(
+                channel_name
+                for channel_names in channel_names_by_participant.values()
+                for channel_name in channel_names
+            )
+        )
+        num_reps = max(
+            (
+                len(reps)
+                for activations in activations_by_participant.values()
+                for channel_activations in activations.values()
+                for reps in channel_activations
+            ),
+            default=0,
+        )
+
+        exercise_indices = {name: i for i, name in enumerate(exercises)}
+        channel_indices = {name: i for i, name in enumerate(channels)}
+        values = np.full(
+            (len(exercises), len(participants), num_reps, len(channels)), np.nan
+        )
+        for p, participant in enumerate(participants):
+            columns = [
+                channel_indices[name]
+                for name in channel_names_by_participant[participant]
+            ]
+            for exercise_name, activations in activations_by_participant[
+                participant
+            ].items():
+                e = exercise_indices[exercise_name]
+                for column, reps in zip(columns, activations):
+                    values[e, p, : len(reps), column] = reps
+
+        return cls(values, exercises, participants, channels)
+
+    @property
+    def shape(self):
+        """tuple: (exercise, participant, rep, channel) shape of the tensor."""
+        return self.values.shape
+
+    @property
+    def groups(self):
+        """list: Group of each participant (e.g. "YT" for "YT1" or "YT1_testing_6_MAT")."""
+        return [get_participant_group(participant) for participant in self.participants]
+
+    def _get_axis(self, axis):
+        """Convert axis names (e.g. "rep") to axis numbers."""
+        if isinstance(axis, (tuple, list)):
+            return tuple(self._get_axis(single_axis) for single_axis in axis)
+        if isinstance(axis, str):
+            return tensor_axes.index(axis)
+        return axis
+
+    def select(self, exercises=None, participants=None, group=None, channels=None):
+        """
+        Select a subset of the tensor by labels.
+
+        Args:
+            exercises (list, optional): Exercise names to keep. Default is all the exercises.
+            participants (list, optional): Participant labels to keep. Default is all the participants.
+            group (str, optional): Keep only the participants of this group (e.g. "YT").
+            channels (list, optional): Channel names to keep. Default is all the channels.
+
+        Returns:
+            ActivationTensor: The selected activations, in the order of the given labels.
+        """
+        exercise_index = (
+            np.arange(len(self.exercises))
+            if exercises is None
+            else np.array([self.exercises.index(name) for name in exercises], dtype=int)
+        )
+        participant_index = (
+            np.arange(len(self.participants))
+            if participants is None
+            else np.array(
+                [self.participants.index(name) for name in participants], dtype=int
+            )
+        )
+        if group is not None:
+            groups = self.groups
+            participant_index = np.array(
+                [p for p in participant_index if groups[p] == group], dtype=int
+            )
+        channel_index = (
+            np.arange(len(self.channels))
+            if channels is None
+            else np.array([self.channels.index(name) for name in channels], dtype=int)
+        )
+
+        values = self.values[np.ix_(exercise_index, participant_index)]
+        return ActivationTensor(
+            values[..., channel_index],
+            [self.exercises[e] for e in exercise_index],
+            [self.participants[p] for p in participant_index],
+            [self.channels[c] for c in channel_index],
+            self.mask[np.ix_(exercise_index, participant_index)],
+        )
+
+    def count(self, axis=None):
+        """
+        Count the recorded values along some axes.
+
+        Args:
+            axis (str, int or tuple, optional): Axes, by name (e.g. "rep") or number. Default is all the axes.
+
+        Returns:
+            np.array: Number of non-missing values.
+        """
+        return np.sum(~np.isnan(self.values), axis=self._get_axis(axis))
+
+    def sum(self, axis=None):
+        """Sum of the recorded values along some axes, see `count`."""
+        return np.nansum(self.values, axis=self._get_axis(axis))
+
+    def mean(self, axis=None):
+        """
+        Mean of the recorded values along some axes, ignoring the missing reps.
+
+        Args:
+            axis (str, int or tuple, optional): Axes, by name (e.g. "rep") or number. Default is all the axes.
+
+        Returns:
+            np.array: The mean, NaN where no value was recorded.
+        """
+        count = self.count(axis)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, self.sum(axis) / count, np.nan)
+
+    def std(self, axis=None):
+        """Population standard deviation of the recorded values along some axes, see `mean`."""
+        axis = self._get_axis(axis)
+        mean = self.mean(axis)
+        keepdims_mean = mean if axis is None else np.expand_dims(mean, axis)
+        count = self.count(axis)
+        squared_deviations = np.nansum(
+            np.square(self.values - keepdims_mean), axis=axis
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, np.sqrt(squared_deviations / count), np.nan)
+
+    def rep_matrix(self, exercise_name):
+        """
+        Get the activation vectors of all the recorded reps of an exercise.
+
+        Args:
+            exercise_name (str): Name of the exercise.
+
+        Returns:
+            tuple: The (reps, channels) matrix, with the reps ordered by participant and rep number, and the
+            (participant, rep number) label of each row.
+        """
+        e = self.exercises.index(exercise_name)
+        participant_index, rep_index = np.nonzero(self.mask[e])
+        labels = [
+            (self.participants[p], r + 1) for p, r in zip(participant_index, rep_index)
+        ]
+        return self.values[e, participant_index, rep_index], labels
+
+    def to_dataframe(self):
+        """
+        Convert the recorded activations to a long table.
+
+        Returns:
+            pd.DataFrame: One row per exercise, participant, rep and channel, with the columns "Exercise",
+            "Participant", "Rep Number", "Muscle Name" and "Activation".
+        """
+        e, p, r, c = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame(
+            {
+                "Exercise": np.array(self.exercises, dtype=object)[e],
+                "Participant": np.array(self.participants, dtype=object)[p],
+                "Rep Number": r + 1,
+                "Muscle Name": np.array(self.channels, dtype=object)[c],
+                "Activation": self.values[e, p, r, c],
+            }
+        )
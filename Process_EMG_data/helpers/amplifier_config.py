@@ -3,3 +3,9 @@ sampling_frequency = 2000  # Hz
 # Set values for bandpass filter
 highcut = 450
 lowcut = 20
+# Frequency of the mains interference removed by the notch filter
+mains_frequency = 50  # Hz
+# Cutoff frequency of the lowpass filter used to extract the envelope
+envelope_cutoff = 5  # Hz
+# Sampling frequency used when the envelope is stored decimated
+envelope_output_rate = 100  # Hz
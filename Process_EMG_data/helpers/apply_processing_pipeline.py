@@ -1,65 +1,264 @@
 from Process_EMG_data.helpers.filtering import (
-    butter_bandpass_filter,
-    butter_lowpass_filter,
-    notch_mains_interference,
+    filter_bank,
+    fir_bandpass_filter,
+    StreamingFilter,
 )
 from Process_EMG_data.helpers.rectify_signal import rectify_signal
 import numpy as np
-from Process_EMG_data.helpers.amplifier_config import highcut, lowcut
+from fractions import Fraction
+from scipy.signal import resample_poly
+from Process_EMG_data.helpers.amplifier_config import (
+    highcut,
+    lowcut,
+    mains_frequency,
+    envelope_cutoff,
+    envelope_output_rate,
+)
 from Process_EMG_data.helpers.utilis import trim_data
+from Process_EMG_data.helpers.compact_recording import CompactRecording, decode_samples
+
 
+class StreamingEnvelope:
+    """
+    Stateful envelope extraction that processes a recording block by block.
 
-def extract_envelope(data, sampling_frequency):
+    The bandpass and notch filters are cascaded into a single SOS chain, the filtered block is
+    rectified in place and then lowpass filtered. The state of the filters is kept between
+    calls, so consecutive blocks give the same envelope as a single call on the whole signal.
+    No trimming is applied, which makes it suitable for live data coming from the amplifier.
+    """
+
+    def __init__(self, sampling_frequency, axis=-1, dtype=float):
+        """
+        Args:
+            sampling_frequency (int): The sampling frequency of the signal.
+            axis (int, optional): Time axis of the blocks. Default is -1.
+            dtype (data-type, optional): Precision used for the computations, float (float64) or np.float32. Default is float.
+        """
+        self.dtype = np.dtype(dtype)
+        bandpass_notch_sos = np.vstack(
+            [
+                filter_bank.bandpass(lowcut, highcut, sampling_frequency),
+                filter_bank.notch(mains_frequency, sampling_frequency),
+            ]
+        )
+        lowpass_sos = filter_bank.lowpass(envelope_cutoff, sampling_frequency)
+        self.bandpass_notch = StreamingFilter(
+            bandpass_notch_sos.astype(self.dtype), axis=axis
+        )
+        self.lowpass = StreamingFilter(lowpass_sos.astype(self.dtype), axis=axis)
+
+    def process(self, block):
+        """
+        Extract the envelope of the next block of raw EMG data.
+
+        Args:
+            block (np.array): The next block of raw EMG data.
+
+        Returns:
+            envelope (np.array): The envelope of the block.
+        """
+        block = np.asarray(block, dtype=self.dtype)
+        filtered_block = self.bandpass_notch.process(block)
+        rectify_signal(filtered_block, out=filtered_block)
+        return self.lowpass.process(filtered_block)
+
+    def reset(self):
+        """Reset the state of all the filters before processing a new recording."""
+        self.bandpass_notch.reset()
+        self.lowpass.reset()
+
+
+def extract_envelope(
+    data,
+    sampling_frequency,
+    axis=-1,
+    out=None,
+    dtype=float,
+    block_size=None,
+    backend="iir",
+):
     """
     Extract the envelope of the EMG signal.
 
+    Multichannel recordings are processed in a single call: every stage is applied to all the
+    channels at once along the time axis. The signal is processed in blocks by a fused
+    bandpass/notch -> rectify -> lowpass kernel that writes straight into the output array, so
+    apart from the output only one block of intermediate results is held in memory. `data` and
+    `out` can be `np.memmap` arrays, which allows recordings larger than the available memory
+    to be processed. `data` can also be a `CompactRecording`, whose int16 or float32 samples are
+    only converted to float one block at a time.
+
+    With `backend="fir"`, the bandpass stage is replaced by a matched linear-phase FIR filter
+    applied with FFT overlap-add convolution on the whole recording, followed by the same IIR
+    notch filter, so both backends have the same magnitude response. The FIR bandpass has no
+    phase distortion, so the envelopes differ slightly in timing. This backend converts compact
+    recordings to float all at once, and whether it is faster depends on the number of cores
+    (see `benchmarks/benchmark_filter_backends.py`).
+
     Args:
-        data (np.array): The raw EMG data.
+        data (np.array or CompactRecording): The raw EMG data, either a single channel or a (channels, samples) array.
         sampling_frequency (int): The sampling frequency of the signal.
+        axis (int, optional): Time axis of the data. Default is -1.
+        out (np.array, optional): Preallocated array where the envelope is written. It must have the shape of the trimmed data.
+        dtype (data-type, optional): Precision of the computations and of the returned envelope, float (float64) or np.float32. Default is float.
+        block_size (int, optional): Number of samples processed at a time. Default is 10 seconds of signal.
+        backend (str, optional): "iir" for the Butterworth and notch filters, "fir" for the FFT overlap-add backend. Default is "iir".
 
     Returns:
-        envelope (np.array): The envelope of the EMG signal.
+        envelope (np.array): The envelope of the EMG signal, with the same layout as the trimmed data.
     """
+    gain = offset = None
+    if isinstance(data, CompactRecording):
+        data, gain, offset = data.samples, data.gain, data.offset
+
     # Trim the data
-    data = trim_data(data, sampling_frequency)
-    # Apply the bandpass filter
-    filtered_data = np.zeros_like(data, dtype=float)
-    filtered_data = butter_bandpass_filter(data, lowcut, highcut, sampling_frequency)
-    # Apply the notch filter
-    filtered_data = notch_mains_interference(
-        filtered_data, mains_freq=50, sampling_frequency=sampling_frequency
-    )
+    data = trim_data(data, sampling_frequency, axis=axis)
+    axis = axis % data.ndim
+
+    if out is None:
+        out = np.empty(data.shape, dtype=dtype)
+    elif out.shape != data.shape:
+        raise ValueError(
+            f"Error: output shape {out.shape} does not match the trimmed data shape {data.shape}"
+        )
+    if block_size is None:
+        block_size = 10 * int(sampling_frequency)
+
+    index = [slice(None)] * data.ndim
+    if backend == "iir":
+        # Filter, rectify and smooth the signal one block at a time
+        streaming_envelope = StreamingEnvelope(
+            sampling_frequency, axis=axis, dtype=dtype
+        )
+        for start in range(0, data.shape[axis], block_size):
+            index[axis] = slice(start, start + block_size)
+            block = data[tuple(index)]
+            if gain is not None:
+                block = decode_samples(block, gain, offset, axis=axis, dtype=dtype)
+            out[tuple(index)] = streaming_envelope.process(block)
+    elif backend == "fir":
+        # Bandpass filter the whole signal with FFT convolution, then apply the notch, rectify and smooth it block by block
+        if gain is not None:
+            data = decode_samples(data, gain, offset, axis=axis, dtype=dtype)
+        filtered_data = fir_bandpass_filter(
+            data, lowcut, highcut, sampling_frequency, axis=axis
+        ).astype(dtype, copy=False)
+        notch = StreamingFilter(
+            filter_bank.notch(mains_frequency, sampling_frequency).astype(dtype),
+            axis=axis,
+        )
+        lowpass = StreamingFilter(
+            filter_bank.lowpass(envelope_cutoff, sampling_frequency).astype(dtype),
+            axis=axis,
+        )
+        for start in range(0, data.shape[axis], block_size):
+            index[axis] = slice(start, start + block_size)
+            block = notch.process(filtered_data[tuple(index)])
+            rectify_signal(block, out=block)
+            out[tuple(index)] = lowpass.process(block)
+    else:
+        raise ValueError(f"Error: unknown filtering backend {backend}")
+    return out
+
+
+def decimate_envelope(envelope, sampling_frequency, output_rate, axis=-1):
+    """
+    Reduce the sampling rate of an envelope using anti-aliased polyphase resampling.
+
+    The envelope is lowpass filtered at a few Hz, so it can be stored at a much lower rate than
+    the amplifier sampling frequency without any visible loss.
+
+    Args:
+        envelope (np.array): The envelope of the EMG signal.
+        sampling_frequency (int): The sampling frequency of the envelope.
+        output_rate (float): The requested sampling frequency of the decimated envelope.
+        axis (int, optional): Time axis of the envelope. Default is -1.
 
-    # Rectify the filtered signal and extract the envelope
-    envelope = np.zeros_like(filtered_data, dtype=float)
-    rectified_data = rectify_signal(filtered_data)
-    envelope = butter_lowpass_filter(
-        rectified_data, cutoff=5, sampling_frequency=sampling_frequency
+    Returns:
+        tuple: The decimated envelope and its effective sampling frequency, which can differ
+        slightly from `output_rate` when the ratio of the two rates is not a simple fraction.
+    """
+    if output_rate <= 0 or output_rate > sampling_frequency:
+        raise ValueError(
+            f"Error: output rate must be between 0 and {sampling_frequency} Hz, got {output_rate} Hz"
+        )
+    ratio = Fraction(output_rate / sampling_frequency).limit_denominator(1000)
+    effective_rate = sampling_frequency * ratio.numerator / ratio.denominator
+    if ratio == 1:
+        return envelope, effective_rate
+
+    decimated_envelope = resample_poly(
+        envelope, ratio.numerator, ratio.denominator, axis=axis, padtype="line"
     )
-    return envelope
+    return decimated_envelope, effective_rate
 
 
-def normalize_signal(data, sampling_frequency, mvc):
+def extract_decimated_envelope(
+    data,
+    sampling_frequency,
+    output_rate=envelope_output_rate,
+    axis=-1,
+    dtype=float,
+):
     """
-    Process the raw EMG data and return the normalized signal.
+    Extract the envelope of the EMG signal and store it at a reduced sampling rate.
 
     Args:
-        data (np.array): The raw EMG data.
+        data (np.array): The raw EMG data, either a single channel or a (channels, samples) array.
         sampling_frequency (int): The sampling frequency of the signal.
-        mvc (array): The MVC value for the channel considered.
+        output_rate (float, optional): Sampling frequency of the returned envelope. Default is `envelope_output_rate` from the amplifier configuration.
+        axis (int, optional): Time axis of the data. Default is -1.
+        dtype (data-type, optional): Precision of the computations, float (float64) or np.float32. Default is float.
 
     Returns:
-        normalized_signal (np.array): The normalized signal.
+        tuple: The decimated envelope and its effective sampling frequency.
     """
+    envelope = extract_envelope(data, sampling_frequency, axis=axis, dtype=dtype)
+    return decimate_envelope(envelope, sampling_frequency, output_rate, axis=axis)
+
 
-    envelope = extract_envelope(data, sampling_frequency)
+def normalize_envelope(envelope, mvc, axis=-1, out=None):
+    """
+    Normalize an envelope by the MVC value of its channel.
 
-    # Normalize the signal using MVC
-    normalized_signal = np.zeros_like(envelope, dtype=float)
-    if mvc != 0:
-        normalized_signal = envelope / mvc
+    Args:
+        envelope (np.array): The envelope of the EMG signal, either a single channel or a (channels, samples) array.
+        mvc (float or array): The MVC value for the channel considered, or one MVC value per channel.
+        axis (int, optional): Time axis of the envelope. Default is -1.
+        out (np.array, optional): Array where the result is written. Pass the envelope itself to normalize in place.
+
+    Returns:
+        normalized_signal (np.array): The normalized signal.
+    """
+    mvc = np.asarray(mvc, dtype=float)
+    if np.all(mvc != 0):
+        if mvc.ndim > 0:
+            # Broadcast one MVC value per channel along the time axis
+            mvc = np.expand_dims(mvc, axis)
+        normalized_signal = np.divide(envelope, mvc, out=out)
     else:
         # normalized_signal = envelope / 1
         # print("Error: MVC is 0")
         raise ValueError(f"Error: Division by zero")
     return normalized_signal
+
+
+def normalize_signal(data, sampling_frequency, mvc, axis=-1):
+    """
+    Process the raw EMG data and return the normalized signal.
+
+    Args:
+        data (np.array): The raw EMG data, either a single channel or a (channels, samples) array.
+        sampling_frequency (int): The sampling frequency of the signal.
+        mvc (float or array): The MVC value for the channel considered, or one MVC value per channel.
+        axis (int, optional): Time axis of the data. Default is -1.
+
+    Returns:
+        normalized_signal (np.array): The normalized signal.
+    """
+
+    envelope = extract_envelope(data, sampling_frequency, axis=axis)
+
+    # Normalize the signal using MVC. The envelope is a fresh array, so it is normalized in place
+    return normalize_envelope(envelope, mvc, axis=axis, out=envelope)
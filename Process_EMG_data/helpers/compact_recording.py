@@ -0,0 +1,145 @@
+import numpy as np
+
+# Sample types that can be used for compact recordings
+compact_dtypes = ("int16", "float32")
+
+int16_max = np.iinfo(np.int16).max
+
+
+def decode_samples(samples, gain, offset, axis=-1, dtype=float):
+    """
+    Convert compact samples to floating point values, `samples * gain + offset`.
+
+    Args:
+        samples (np.array): The compact samples, either a single channel or a (channels, samples) array.
+        gain (float or np.array): Gain of the samples, one per channel.
+        offset (float or np.array): Offset of the samples, one per channel.
+        axis (int, optional): Time axis of the samples. Default is -1.
+        dtype (data-type, optional): Precision of the returned values, float (float64) or np.float32. Default is float.
+
+    Returns:
+        np.array: A new array with the decoded values.
+    """
+    gain = np.asarray(gain, dtype=dtype)
+    offset = np.asarray(offset, dtype=dtype)
+    if gain.ndim > 0 and np.ndim(samples) > 1:
+        # Broadcast one gain and offset per channel along the time axis
+        gain = np.expand_dims(gain, axis)
+        offset = np.expand_dims(offset, axis)
+    values = np.multiply(samples, gain, dtype=dtype)
+    values += offset
+    return values
+
+
+class CompactRecording:
+    """
+    Raw recording stored with a compact sample type and per-channel scale metadata.
+
+    The value of each sample is `samples * gain + offset`, with one gain and offset per channel. int16 samples
+    take a quarter of the memory of the float64 arrays returned by `loadmat`, float32 samples half of it, so
+    whole sessions of 64 channel recordings can be kept in memory. The samples are only converted to float by
+    the processing kernels, one block at a time (see `extract_envelope`).
+
+    Indexing works as for the (channels, samples) array and returns a `CompactRecording` with the matching gains
+    and offsets, e.g. `recording[:8, :10000]`.
+    """
+
+    def __init__(self, samples, gain=1.0, offset=0.0):
+        """
+        Args:
+            samples (np.array): The compact samples, either a single channel or a (channels, samples) array.
+            gain (float or np.array, optional): Gain of the samples, one per channel. Default is 1.
+            offset (float or np.array, optional): Offset of the samples, one per channel. Default is 0.
+        """
+        self.samples = samples
+        self.gain = np.asarray(gain, dtype=float)
+        self.offset = np.asarray(offset, dtype=float)
+
+    @property
+    def shape(self):
+        """tuple: Shape of the recording."""
+        return self.samples.shape
+
+    @property
+    def ndim(self):
+        """int: Number of dimensions of the recording."""
+        return self.samples.ndim
+
+    @property
+    def dtype(self):
+        """np.dtype: Type of the compact samples."""
+        return self.samples.dtype
+
+    @property
+    def nbytes(self):
+        """int: Memory used by the samples."""
+        return self.samples.nbytes
+
+    def __getitem__(self, index):
+        """Select channels and samples, keeping the gain and offset of the selected channels."""
+        if not isinstance(index, tuple):
+            index = (index,)
+        samples = self.samples[index]
+        if self.samples.ndim == 1 or self.gain.ndim == 0:
+            return CompactRecording(samples, self.gain, self.offset)
+        return CompactRecording(samples, self.gain[index[0]], self.offset[index[0]])
+
+    def decode(self, dtype=float):
+        """
+        Convert the whole recording to floating point values.
+
+        Args:
+            dtype (data-type, optional): Precision of the returned values, float (float64) or np.float32. Default is float.
+
+        Returns:
+            np.array: The decoded recording.
+        """
+        return decode_samples(self.samples, self.gain, self.offset, dtype=dtype)
+
+
+def compress_recording(data, dtype="int16", gain=None):
+    """
+    Convert a raw recording to a compact representation.
+
+    With "float32" the samples are only rounded to single precision. With "int16" each channel is quantized on
+    the 65535 levels spanning its range, unless the gain is given: pass the resolution of the amplifier to keep
+    the samples as recorded, without any further quantization.
+
+    Args:
+        data (np.array): The raw recording, either a single channel or a (channels, samples) array.
+        dtype (str, optional): Type of the compact samples, "int16" or "float32". Default is "int16".
+        gain (float or np.array, optional): Gain of the int16 samples, one per channel. Default is computed from the range of each channel.
+
+    Returns:
+        CompactRecording: The compact recording.
+    """
+    if dtype not in compact_dtypes:
+        raise ValueError(
+            f"Error: unknown compact sample type {dtype}, expected one of {compact_dtypes}"
+        )
+    data = np.asarray(data)
+    if dtype == "float32":
+        return CompactRecording(data.astype(np.float32))
+
+    channels = data.reshape(-1, data.shape[-1])
+    if gain is None:
+        minimum = channels.min(axis=-1)
+        maximum = channels.max(axis=-1)
+        offset = (maximum + minimum) / 2
+        gain = (maximum - minimum) / (2 * int16_max)
+        # Constant channels are stored as zeros with their value in the offset
+        gain[gain == 0] = 1.0
+    else:
+        gain = np.broadcast_to(np.asarray(gain, dtype=float), channels.shape[:1])
+        offset = np.zeros(channels.shape[0])
+
+    samples = np.empty(channels.shape, dtype=np.int16)
+    # Quantize one channel at a time to avoid float64 temporaries of the whole recording
+    for row, channel in enumerate(channels):
+        quantized = np.rint((channel - offset[row]) / gain[row])
+        np.clip(quantized, -int16_max, int16_max, out=quantized)
+        samples[row] = quantized
+
+    if data.ndim == 1:
+        return CompactRecording(samples[0], gain[0], offset[0])
+    return CompactRecording(samples.reshape(data.shape), gain, offset)
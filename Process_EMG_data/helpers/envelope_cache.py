@@ -0,0 +1,411 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from Process_EMG_data.helpers.amplifier_config import (
+    highcut,
+    lowcut,
+    mains_frequency,
+    envelope_cutoff,
+)
+from Process_EMG_data.helpers.apply_processing_pipeline import extract_envelope
+from Process_EMG_data.helpers.prefetch import (
+    default_max_prefetch_bytes,
+    default_prefetch,
+    prefetch_map,
+)
+from Process_EMG_data.helpers.recording_reader import get_recording_size, load_recording
+from Process_EMG_data.helpers.recording_store import get_stored_recording_format
+
+# Default location and size of the on-disk envelope cache
+default_cache_directory = os.path.join(
+    os.path.expanduser("~"), ".cache", "Process_EMG_data", "envelopes"
+)
+default_max_bytes = 5 * 1024**3  # 5 GB
+
+# Bump when the envelope computation changes in a way not captured by the parameters
+cache_format_version = 1
+
+
+def hash_file_content(filepath, chunk_size=1024**2):
+    """
+    Compute the SHA-256 hash of the content of a file.
+
+    Args:
+        filepath (str): Path to the file.
+        chunk_size (int, optional): Number of bytes read at a time. Default is 1 MB.
+
+    Returns:
+        str: Hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_pipeline_parameters(sampling_frequency, filepath=None):
+    """
+    Collect the parameters that determine the envelope of a recording.
+
+    Args:
+        sampling_frequency (int): The sampling frequency of the signal.
+        filepath (str, optional): Path to the recording. If given, the parameters also describe whether its samples
+            are read from the .mat file or from a compact stored copy (see `get_stored_recording_format`).
+
+    Returns:
+        dict: Pipeline parameters used as part of the cache key.
+    """
+    parameters = {
+        "version": cache_format_version,
+        "sampling_frequency": sampling_frequency,
+        "lowcut": lowcut,
+        "highcut": highcut,
+        "mains_frequency": mains_frequency,
+        "envelope_cutoff": envelope_cutoff,
+        "trim_samples": int(sampling_frequency),
+    }
+    if filepath is not None:
+        parameters["samples"] = get_stored_recording_format(filepath)
+    return parameters
+
+
+class EnvelopeCache:
+    """
+    Persistent cache of the envelopes of .mat recordings.
+
+    Envelopes are stored as .npy files named after the SHA-256 hash of the recording content and
+    of the pipeline parameters, so a recording is reprocessed only when its content or the
+    processing changes, regardless of where the file lives. Cached envelopes are returned as
+    read-only memory maps. When the cache grows beyond `max_bytes`, the least recently used
+    envelopes are deleted.
+
+    To avoid hashing every recording on every run, the hash of each file is remembered together
+    with its size and modification time, and only recomputed when one of them changes. Worker processes
+    use a copy of the cache that does not write this table (see `worker_copy`), and the calling process
+    saves the hashes they computed with `update_file_hashes`.
+    """
+
+    def __init__(
+        self,
+        cache_directory=default_cache_directory,
+        max_bytes=None,
+        save_file_hashes=True,
+    ):
+        """
+        Args:
+            cache_directory (str, optional): Directory where the envelopes are stored.
+            max_bytes (int, optional): Maximum total size of the cached envelopes. Default is 5 GB.
+            save_file_hashes (bool, optional): If False, new file hashes are only kept in memory. Default is True.
+        """
+        self.cache_directory = cache_directory
+        self.max_bytes = default_max_bytes if max_bytes is None else max_bytes
+        self.save_file_hashes = save_file_hashes
+        os.makedirs(self.cache_directory, exist_ok=True)
+        self._file_hashes_path = os.path.join(self.cache_directory, "file_hashes.json")
+        self._file_hashes = None
+
+    def worker_copy(self):
+        """
+        Create a copy of the cache to be sent to worker processes.
+
+        Each process would otherwise rewrite the whole table of file hashes with only its own entries,
+        overwriting the hashes saved by the other processes. The copy starts from the known hashes and
+        keeps the new ones in memory: return them with `get_file_hash_entry`.
+
+        Returns:
+            EnvelopeCache: Cache sharing the same directory, which does not write the table of file hashes.
+        """
+        copy = EnvelopeCache(
+            self.cache_directory, self.max_bytes, save_file_hashes=False
+        )
+        copy._file_hashes = dict(self._load_file_hashes())
+        return copy
+
+    def get_file_hash_entry(self, filepath):
+        """
+        Get the known hash of a file.
+
+        Args:
+            filepath (str): Path to the recording.
+
+        Returns:
+            tuple or None: The absolute path and the [size, modification time, hash] entry of the file, or None if it was never hashed.
+        """
+        absolute_path = os.path.abspath(filepath)
+        entry = self._load_file_hashes().get(absolute_path)
+        return None if entry is None else (absolute_path, entry)
+
+    def update_file_hashes(self, entries):
+        """
+        Add file hashes computed elsewhere (e.g. by `worker_copy` caches) and save the table once.
+
+        Args:
+            entries (iterable): (absolute path, [size, modification time, hash]) pairs, as returned by `get_file_hash_entry`.
+        """
+        file_hashes = self._load_file_hashes()
+        changed = False
+        for absolute_path, entry in entries:
+            if file_hashes.get(absolute_path) != entry:
+                file_hashes[absolute_path] = entry
+                changed = True
+        if changed and self.save_file_hashes:
+            self._save_file_hashes()
+
+    def _load_file_hashes(self):
+        """Load the table of known file hashes from disk."""
+        if self._file_hashes is None:
+            try:
+                with open(self._file_hashes_path, "r") as file:
+                    self._file_hashes = json.load(file)
+            except (OSError, ValueError):
+                self._file_hashes = {}
+        return self._file_hashes
+
+    def _save_file_hashes(self):
+        """Write the table of known file hashes to disk."""
+        # Serialize a copy, since other threads may be adding hashes (see `iter_envelopes`)
+        file_hashes = dict(self._file_hashes)
+        self._write_atomically(
+            self._file_hashes_path,
+            lambda file: file.write(json.dumps(file_hashes).encode()),
+        )
+
+    def _write_atomically(self, path, write):
+        """
+        Write a file through a temporary file, so that readers never see a partial file.
+
+        Args:
+            path (str): Destination path.
+            write (callable): Function writing the content to the open binary file it receives.
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.cache_directory, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                write(file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def get_content_hash(self, filepath):
+        """
+        Get the hash of the content of a recording, reusing the stored one if the file did not change.
+
+        Args:
+            filepath (str): Path to the recording.
+
+        Returns:
+            str: Hexadecimal digest of the file content.
+        """
+        file_hashes = self._load_file_hashes()
+        stat = os.stat(filepath)
+        absolute_path = os.path.abspath(filepath)
+        entry = file_hashes.get(absolute_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        content_hash = hash_file_content(filepath)
+        file_hashes[absolute_path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        if self.save_file_hashes:
+            self._save_file_hashes()
+        return content_hash
+
+    def get_key(self, filepath, sampling_frequency):
+        """
+        Build the cache key of a recording.
+
+        Args:
+            filepath (str): Path to the recording.
+            sampling_frequency (int): The sampling frequency of the signal.
+
+        Returns:
+            str: Cache key combining the file content, the pipeline parameters and the format of the samples.
+        """
+        parameters = json.dumps(
+            get_pipeline_parameters(sampling_frequency, filepath), sort_keys=True
+        )
+        digest = hashlib.sha256()
+        digest.update(self.get_content_hash(filepath).encode())
+        digest.update(parameters.encode())
+        return digest.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_directory, f"{key}.npy")
+
+    def load(self, key):
+        """
+        Load a cached envelope as a read-only memory map.
+
+        Args:
+            key (str): Cache key of the recording.
+
+        Returns:
+            np.memmap or None: The cached envelope, or None if it is not in the cache.
+        """
+        path = self._get_path(key)
+        try:
+            envelope = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        # Mark the envelope as recently used (it may have been evicted concurrently)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return envelope
+
+    def store(self, key, envelope):
+        """
+        Store an envelope in the cache and evict old envelopes if the cache is too large.
+
+        Args:
+            key (str): Cache key of the recording.
+            envelope (np.array): The envelope to be stored.
+        """
+        self._write_atomically(
+            self._get_path(key), lambda file: np.save(file, np.asarray(envelope))
+        )
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used envelopes until the cache fits in `max_bytes`."""
+        entries = []
+        for entry in os.scandir(self.cache_directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+
+    def clear(self):
+        """Delete all the cached envelopes."""
+        for entry in os.scandir(self.cache_directory):
+            if entry.name.endswith(".npy"):
+                os.remove(entry.path)
+
+    def get_envelope(self, filepath, sampling_frequency):
+        """
+        Get the envelope of all the channels of a recording, computing and caching it if needed.
+
+        Args:
+            filepath (str): Path to the .mat recording.
+            sampling_frequency (int): The sampling frequency of the signal.
+
+        Returns:
+            np.array: The (channels, samples) envelope of the recording, as a read-only memory map when it comes from the cache.
+        """
+        key = self.get_key(filepath, sampling_frequency)
+        envelope = self.load(key)
+        if envelope is not None:
+            return envelope
+        return self._compute(key, filepath, sampling_frequency)
+
+    def prepare(self, filepath, sampling_frequency):
+        """
+        Make sure the envelope of a recording is in the cache, without loading it if it already is.
+
+        Worker processes use this to hand back only the key, so that the envelope is read through a memory map
+        instead of being pickled between processes.
+
+        Args:
+            filepath (str): Path to the .mat recording.
+            sampling_frequency (int): The sampling frequency of the signal.
+
+        Returns:
+            str: Cache key of the recording, see `load`.
+        """
+        key = self.get_key(filepath, sampling_frequency)
+        if not os.path.exists(self._get_path(key)):
+            self._compute(key, filepath, sampling_frequency)
+        return key
+
+    def _compute(self, key, filepath, sampling_frequency):
+        """Compute the envelope of a recording and store it in the cache."""
+        # Compact recordings are converted to float one block at a time by the kernel
+        data = load_recording(filepath, decode=False)
+        envelope = extract_envelope(data, sampling_frequency)
+        self.store(key, envelope)
+        return envelope
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Get the envelope cache shared by the analysis scripts.
+
+    Returns:
+        EnvelopeCache: Cache stored in `default_cache_directory`.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EnvelopeCache()
+    return _default_cache
+
+
+def load_envelope(filepath, sampling_frequency, cache=None):
+    """
+    Get the envelope of all the channels of a recording through the envelope cache.
+
+    Args:
+        filepath (str): Path to the .mat recording.
+        sampling_frequency (int): The sampling frequency of the signal.
+        cache (EnvelopeCache, optional): Cache to use. Default is the shared cache.
+
+    Returns:
+        np.array: The (channels, samples) envelope of the recording.
+    """
+    if cache is None:
+        cache = get_default_cache()
+    return cache.get_envelope(filepath, sampling_frequency)
+
+
+def iter_envelopes(
+    filepaths,
+    sampling_frequency,
+    cache=None,
+    prefetch=default_prefetch,
+    max_bytes=default_max_prefetch_bytes,
+):
+    """
+    Iterate over the envelopes of several recordings, loading the next recordings in the background.
+
+    While an envelope is being used, the next `prefetch` recordings are read, hashed and, on a cache miss, filtered
+    on a thread pool (see `prefetch_map`).
+
+    Args:
+        filepaths (list): Paths to the .mat recordings.
+        sampling_frequency (int): The sampling frequency of the signal.
+        cache (EnvelopeCache, optional): Cache to use. Default is the shared cache.
+        prefetch (int, optional): Maximum number of recordings loaded ahead. With 0 the recordings are loaded sequentially. Default is 2.
+        max_bytes (int, optional): Maximum size in memory of the recordings loaded ahead, see `get_recording_size`. Default is 2 GB.
+
+    Yields:
+        tuple: The path and the (channels, samples) envelope of each recording, in the order of `filepaths`.
+    """
+    if cache is None:
+        cache = get_default_cache()
+    return prefetch_map(
+        lambda filepath: cache.get_envelope(filepath, sampling_frequency),
+        filepaths,
+        prefetch=prefetch,
+        max_bytes=max_bytes,
+        get_size=get_recording_size,
+    )
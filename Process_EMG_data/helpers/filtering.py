@@ -1,9 +1,186 @@
-from scipy.signal import butter, lfilter, iirnotch
+from scipy.fft import set_workers
+from scipy.signal import (
+    butter,
+    firwin2,
+    iirnotch,
+    oaconvolve,
+    sosfilt,
+    sosfreqz,
+    tf2sos,
+)
 import numpy as np
 import matplotlib.pyplot as plt
 
 
-def butter_bandpass_filter(data, lowcut, highcut, sampling_frequency, order=5):
+class FilterBank:
+    """
+    Cache of filter designs stored in second-order-section (SOS) form.
+
+    Each filter is designed once per (type, order, cutoffs, sampling frequency, quality factor)
+    and reused on every subsequent call, so processing thousands of channels does not redesign
+    the same filter over and over. Filtering is done with `sosfilt`, which is numerically stable
+    for high filter orders and narrow bands (e.g. the 5 Hz envelope lowpass at 2000 Hz).
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def _get_or_design(self, key, design):
+        """
+        Return the cached SOS array for `key`, designing it with `design()` if needed.
+
+        Args:
+            key (tuple): Hashable description of the filter.
+            design (callable): Function returning the SOS array of the filter.
+
+        Returns:
+            ndarray: SOS array of shape (n_sections, 6). It is shared, so do not modify it in place.
+        """
+        sos = self._cache.get(key)
+        if sos is None:
+            sos = np.asarray(design(), dtype=float)
+            self._cache[key] = sos
+        return sos
+
+    def bandpass(self, lowcut, highcut, sampling_frequency, order=5):
+        """
+        Get the Butterworth bandpass filter in SOS form.
+
+        Args:
+            lowcut (float): Low frequency (in Hz) edge of the passband.
+            highcut (float): High frequency (in Hz) edge of the passband.
+            sampling_frequency (float): Sampling frequency of the data (in Hz).
+            order (int, optional): Order of the filter. Default is 5.
+
+        Returns:
+            ndarray: SOS array of the filter.
+        """
+        key = (
+            "bandpass",
+            int(order),
+            (float(lowcut), float(highcut)),
+            float(sampling_frequency),
+            None,
+        )
+
+        def design():
+            nyquist = 0.5 * sampling_frequency
+            low = lowcut / nyquist
+            high = highcut / nyquist
+            return butter(order, [low, high], btype="band", output="sos")
+
+        return self._get_or_design(key, design)
+
+    def lowpass(self, cutoff, sampling_frequency, order=5):
+        """
+        Get the Butterworth lowpass filter in SOS form.
+
+        Args:
+            cutoff (float): Frequency (in Hz) below which signal remains unaffected.
+            sampling_frequency (float): Sampling frequency of the data (in Hz).
+            order (int, optional): Order of the filter. Default is 5.
+
+        Returns:
+            ndarray: SOS array of the filter.
+        """
+        key = ("lowpass", int(order), (float(cutoff),), float(sampling_frequency), None)
+
+        def design():
+            nyquist = 0.5 * sampling_frequency
+            cutoff_norm = cutoff / nyquist
+            return butter(order, cutoff_norm, btype="low", analog=False, output="sos")
+
+        return self._get_or_design(key, design)
+
+    def notch(self, mains_freq, sampling_frequency, quality_factor=30):
+        """
+        Get the notch filter used to remove mains interference in SOS form.
+
+        Args:
+            mains_freq (float): Frequency (in Hz) of the mains interference, usually 50 or 60 Hz.
+            sampling_frequency (float): Sampling frequency of the data (in Hz).
+            quality_factor (float, optional): Quality factor for the notch filter. Default is 30.
+
+        Returns:
+            ndarray: SOS array of the filter.
+        """
+        key = (
+            "notch",
+            2,
+            (float(mains_freq),),
+            float(sampling_frequency),
+            float(quality_factor),
+        )
+
+        def design():
+            nyquist = 0.5 * sampling_frequency
+            freq = mains_freq / nyquist
+            b, a = iirnotch(freq, Q=quality_factor)
+            return tf2sos(b, a)
+
+        return self._get_or_design(key, design)
+
+    def fir_bandpass(
+        self,
+        lowcut,
+        highcut,
+        sampling_frequency,
+        numtaps=2001,
+        order=5,
+    ):
+        """
+        Get a linear-phase FIR filter matching the magnitude response of the bandpass filter.
+
+        The FIR taps are designed with `firwin2` so that their magnitude response follows
+        `bandpass` (maximum magnitude error of about 0.0015 with the default length). The filter
+        has a constant delay of (numtaps - 1) / 2 samples, which `fir_bandpass_notch_filter`
+        compensates. The narrow mains notch is not included, since an FIR filter of practical
+        length cannot reproduce it: `fir_bandpass_notch_filter` applies the IIR notch afterwards.
+
+        Args:
+            lowcut (float): Low frequency (in Hz) edge of the passband.
+            highcut (float): High frequency (in Hz) edge of the passband.
+            sampling_frequency (float): Sampling frequency of the data (in Hz).
+            numtaps (int, optional): Length of the filter. It is rounded up to an odd number. Default is 2001.
+            order (int, optional): Order of the Butterworth bandpass filter being matched. Default is 5.
+
+        Returns:
+            ndarray: FIR filter taps.
+        """
+        numtaps = int(numtaps) | 1
+        key = (
+            "fir_bandpass",
+            numtaps,
+            (float(lowcut), float(highcut), int(order)),
+            float(sampling_frequency),
+            None,
+        )
+
+        def design():
+            iir_sos = self.bandpass(lowcut, highcut, sampling_frequency, order)
+            frequencies = np.linspace(0, 0.5 * sampling_frequency, 8 * numtaps + 1)
+            _, response = sosfreqz(iir_sos, worN=frequencies, fs=sampling_frequency)
+            # A mild Kaiser window keeps the passband error low
+            return firwin2(
+                numtaps,
+                frequencies,
+                np.abs(response),
+                fs=sampling_frequency,
+                window=("kaiser", 2.0),
+            )
+
+        return self._get_or_design(key, design)
+
+    def clear(self):
+        """Remove all the cached filter designs."""
+        self._cache.clear()
+
+
+# Filter bank shared by all the filtering functions of the package
+filter_bank = FilterBank()
+
+
+def butter_bandpass_filter(data, lowcut, highcut, sampling_frequency, order=5, axis=-1):
     """
     Apply a bandpass filter to the given data using the Butterworth filter design.
 
@@ -13,19 +190,17 @@ def butter_bandpass_filter(data, lowcut, highcut, sampling_frequency, order=5):
         highcut (float): High frequency (in Hz) edge of the passband.
         sampling_frequency (float): Sampling frequency of the data (in Hz).
         order (int, optional): Order of the filter. Default is 5.
+        axis (int, optional): Time axis of the data. Default is -1.
 
     Returns:
         ndarray: Filtered data.
     """
-    nyquist = 0.5 * sampling_frequency
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = butter(order, [low, high], btype="band")
-    filtered_data = lfilter(b, a, data)
+    sos = filter_bank.bandpass(lowcut, highcut, sampling_frequency, order)
+    filtered_data = sosfilt(sos, data, axis=axis)
     return filtered_data
 
 
-def butter_lowpass_filter(data, cutoff, sampling_frequency, order=5):
+def butter_lowpass_filter(data, cutoff, sampling_frequency, order=5, axis=-1):
     """
     Apply a lowpass filter to the given data using the Butterworth filter design.
 
@@ -34,18 +209,19 @@ def butter_lowpass_filter(data, cutoff, sampling_frequency, order=5):
         cutoff (float): Frequency (in Hz) below which signal remains unaffected.
         sampling_frequency (float): Sampling frequency of the data (in Hz).
         order (int, optional): Order of the filter. Default is 5.
+        axis (int, optional): Time axis of the data. Default is -1.
 
     Returns:
         ndarray: Filtered data.
     """
-    nyquist = 0.5 * sampling_frequency
-    cutoff_norm = cutoff / nyquist
-    b, a = butter(order, cutoff_norm, btype="low", analog=False)
-    filtered_data = lfilter(b, a, data)
+    sos = filter_bank.lowpass(cutoff, sampling_frequency, order)
+    filtered_data = sosfilt(sos, data, axis=axis)
     return filtered_data
 
 
-def notch_mains_interference(data, mains_freq, sampling_frequency, quality_factor=30):
+def notch_mains_interference(
+    data, mains_freq, sampling_frequency, quality_factor=30, axis=-1
+):
     """
     Apply a notch filter to remove mains interference from the given data.
 
@@ -54,12 +230,170 @@ def notch_mains_interference(data, mains_freq, sampling_frequency, quality_facto
         mains_freq (float): Frequency (in Hz) of the mains interference, usually 50 or 60 Hz.
         sampling_frequency (float): Sampling frequency of the data (in Hz).
         quality_factor (float, optional): Quality factor for the notch filter, determining the bandwidth of the notch. Default is 30.
+        axis (int, optional): Time axis of the data. Default is -1.
 
     Returns:
         ndarray: Filtered data with the mains interference removed.
     """
-    nyquist = 0.5 * sampling_frequency
-    freq = mains_freq / nyquist
-    b, a = iirnotch(freq, Q=quality_factor)
-    filtered_data = lfilter(b, a, data)
+    sos = filter_bank.notch(mains_freq, sampling_frequency, quality_factor)
+    filtered_data = sosfilt(sos, data, axis=axis)
     return filtered_data
+
+
+def fir_bandpass_filter(
+    data,
+    lowcut,
+    highcut,
+    sampling_frequency,
+    numtaps=2001,
+    axis=-1,
+    workers=-1,
+):
+    """
+    Apply the bandpass filter as a linear-phase FIR filter using FFT overlap-add convolution.
+
+    The magnitude response matches `butter_bandpass_filter`, but the filter is linear phase and
+    its delay is removed, so the output is aligned with the input. Overlap-add convolution works
+    on blocks of samples with multithreaded FFTs.
+
+    Args:
+        data (ndarray): Input data to be filtered.
+        lowcut (float): Low frequency (in Hz) edge of the passband.
+        highcut (float): High frequency (in Hz) edge of the passband.
+        sampling_frequency (float): Sampling frequency of the data (in Hz).
+        numtaps (int, optional): Length of the FIR filter. Default is 2001.
+        axis (int, optional): Time axis of the data. Default is -1.
+        workers (int, optional): Number of threads used for the FFTs, -1 for all the cores. Default is -1.
+
+    Returns:
+        ndarray: Filtered data.
+    """
+    data = np.asarray(data)
+    taps = filter_bank.fir_bandpass(lowcut, highcut, sampling_frequency, numtaps)
+    taps_shape = [1] * data.ndim
+    taps_shape[axis] = taps.size
+    with set_workers(workers):
+        filtered_data = oaconvolve(
+            data, taps.reshape(taps_shape), mode="full", axes=axis
+        )
+
+    # Compensate the (numtaps - 1) / 2 samples delay of the linear-phase filter
+    delay = (taps.size - 1) // 2
+    index = [slice(None)] * data.ndim
+    index[axis] = slice(delay, delay + data.shape[axis])
+    return filtered_data[tuple(index)]
+
+
+def fir_bandpass_notch_filter(
+    data,
+    lowcut,
+    highcut,
+    mains_freq,
+    sampling_frequency,
+    numtaps=2001,
+    axis=-1,
+    workers=-1,
+):
+    """
+    Apply the FIR bandpass filter followed by the IIR notch filter.
+
+    This is an alternative backend to `butter_bandpass_filter` followed by
+    `notch_mains_interference`: the bandpass stage is replaced by `fir_bandpass_filter`, and the
+    notch is the same IIR filter, so the magnitude response matches the IIR cascade, including
+    the attenuation at the mains frequency.
+
+    Args:
+        data (ndarray): Input data to be filtered.
+        lowcut (float): Low frequency (in Hz) edge of the passband.
+        highcut (float): High frequency (in Hz) edge of the passband.
+        mains_freq (float): Frequency (in Hz) of the mains interference, usually 50 or 60 Hz.
+        sampling_frequency (float): Sampling frequency of the data (in Hz).
+        numtaps (int, optional): Length of the FIR filter. Default is 2001.
+        axis (int, optional): Time axis of the data. Default is -1.
+        workers (int, optional): Number of threads used for the FFTs, -1 for all the cores. Default is -1.
+
+    Returns:
+        ndarray: Filtered data.
+    """
+    filtered_data = fir_bandpass_filter(
+        data, lowcut, highcut, sampling_frequency, numtaps, axis, workers
+    )
+    return notch_mains_interference(
+        filtered_data, mains_freq, sampling_frequency, axis=axis
+    )
+
+
+class StreamingFilter:
+    """
+    Stateful SOS filter that processes a recording block by block.
+
+    The filter state (`zi`) is kept between calls to `process`, so filtering a recording in
+    consecutive blocks gives exactly the same output as filtering the whole array in one call.
+    This allows recordings that do not fit in memory, or that arrive live from the amplifier,
+    to be filtered with the same filters as the rest of the package.
+    """
+
+    def __init__(self, sos, axis=-1):
+        """
+        Args:
+            sos (ndarray): Filter in second-order-section form, shape (n_sections, 6).
+            axis (int, optional): Time axis of the blocks. Default is -1.
+        """
+        self.sos = sos
+        self.axis = axis
+        self.zi = None
+
+    @classmethod
+    def bandpass(cls, lowcut, highcut, sampling_frequency, order=5, axis=-1):
+        """Create a streaming version of `butter_bandpass_filter`."""
+        return cls(
+            filter_bank.bandpass(lowcut, highcut, sampling_frequency, order), axis
+        )
+
+    @classmethod
+    def lowpass(cls, cutoff, sampling_frequency, order=5, axis=-1):
+        """Create a streaming version of `butter_lowpass_filter`."""
+        return cls(filter_bank.lowpass(cutoff, sampling_frequency, order), axis)
+
+    @classmethod
+    def notch(cls, mains_freq, sampling_frequency, quality_factor=30, axis=-1):
+        """Create a streaming version of `notch_mains_interference`."""
+        return cls(
+            filter_bank.notch(mains_freq, sampling_frequency, quality_factor), axis
+        )
+
+    def _initial_state(self, block):
+        """
+        Create a zero filter state matching the shape of the given block.
+
+        Args:
+            block (ndarray): First block of data to be filtered.
+
+        Returns:
+            ndarray: Zero state of shape (n_sections, ..., 2, ...), where the time axis of the
+            block is replaced by the two delays of each section.
+        """
+        state_shape = list(block.shape)
+        state_shape[self.axis] = 2
+        dtype = np.result_type(block, self.sos)
+        return np.zeros((self.sos.shape[0],) + tuple(state_shape), dtype=dtype)
+
+    def process(self, block):
+        """
+        Filter the next block of the recording.
+
+        Args:
+            block (ndarray): Next block of data. All blocks must have the same shape except along the time axis.
+
+        Returns:
+            ndarray: Filtered block.
+        """
+        block = np.asarray(block)
+        if self.zi is None:
+            self.zi = self._initial_state(block)
+        filtered_block, self.zi = sosfilt(self.sos, block, axis=self.axis, zi=self.zi)
+        return filtered_block
+
+    def reset(self):
+        """Reset the filter state, so that the next block starts a new recording."""
+        self.zi = None
@@ -1,7 +1,6 @@
 from tkinter import Tk
 
 import numpy as np
-from scipy.io import loadmat
 from tkinter import filedialog
 from Process_EMG_data.helpers.rectify_signal import rectify_signal
 from Process_EMG_data.helpers.amplifier_config import (
@@ -10,10 +9,16 @@ from Process_EMG_data.helpers.amplifier_config import (
     highcut,
 )
 import matplotlib.pyplot as plt
+import pandas as pd
 import fnmatch
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from Process_EMG_data.helpers.utilis import get_exercise_name, get_channel_names
 from Process_EMG_data.helpers.apply_processing_pipeline import extract_envelope
+from Process_EMG_data.helpers.envelope_cache import get_pipeline_parameters
+from Process_EMG_data.helpers.recording_reader import iter_recordings, load_recording
+from Process_EMG_data.helpers.recording_store import get_stored_recording_format
 import tkinter as tk
 
 
@@ -34,10 +39,73 @@ def process_mvc_data_for_channel(channel_data):
     return calculate_mvc_for_channel(mvc_envelope, sampling_frequency)
 
 
+def get_mvc_filenames(directory_path):
+    """
+    List the .mat files containing MVCs in a specified directory, in alphabetical order.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+
+    Returns:
+        list: Filenames of the MVC files.
+    """
+    return sorted(
+        filename
+        for filename in os.listdir(directory_path)
+        if fnmatch.fnmatch(filename, "*.mat")
+    )
+
+
+def load_mvc_data(filepath, channel_indices=None, decode=True):
+    """
+    Load the raw data of an MVC file, optionally keeping only some of the channels.
+
+    Only the "data" variable is read from the file, and with MATLAB v7.3 files only the selected channels are read
+    from disk. When channels are selected, the returned array is a copy, so the full recording can be freed as soon
+    as the function returns.
+
+    Args:
+        filepath (str): Path to the MVC file.
+        channel_indices (list or slice, optional): Channels to be kept. Default is all the channels.
+        decode (bool, optional): If False, recordings stored in compact form are returned as a `CompactRecording`,
+            which `extract_envelope` accepts directly. Default is True.
+
+    Returns:
+        ndarray or CompactRecording: The (channels, samples) raw data.
+    """
+    return load_recording(filepath, channel_indices, decode=decode)
+
+
+def iter_mvc_files(directory_path, channel_indices=None, prefetch=0):
+    """
+    Lazily iterate over the MVC files of a directory, loading one file at a time.
+
+    Each recording is only referenced by the iterator until the next one is requested, so by default the memory
+    used is about one recording regardless of the number of MVC files. With `prefetch`, the next files are read
+    in the background while the current one is processed, which hides the read latency at the cost of keeping
+    `prefetch` more recordings in memory.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+        channel_indices (list or slice, optional): Channels to be loaded. Default is all the channels.
+        prefetch (int, optional): Number of files loaded ahead, see `iter_recordings`. Default is 0.
+
+    Yields:
+        tuple: The filename and the (channels, samples) raw data of each MVC file.
+    """
+    filenames = get_mvc_filenames(directory_path)
+    filepaths = [os.path.join(directory_path, filename) for filename in filenames]
+    recordings = iter_recordings(filepaths, channel_indices, prefetch=prefetch)
+    for filename, (_, data) in zip(filenames, recordings):
+        yield filename, data
+
+
 def get_mvc_files(directory_path):
     """
     Retrieve all the .mat files containing MVCs from a specified directory.
 
+    All the recordings are kept in memory; use `iter_mvc_files` to process them one at a time.
+
     Args:
         directory_path (str): Path to the directory containing MVC files.
 
@@ -46,17 +114,115 @@ def get_mvc_files(directory_path):
     """
     mvc_files = []
     mvc_filenames = []
-    for filename in os.listdir(directory_path):
-        if fnmatch.fnmatch(filename, "*.mat"):
-            filepath = os.path.join(directory_path, filename)
-            mat = loadmat(filepath)
-            data = mat["data"]
-            mvc_files.append(data)
-            mvc_filenames.append(filename)
-    # print(f"MVC filenames:{mvc_filenames}")
+    for filename, data in iter_mvc_files(directory_path):
+        mvc_files.append(data)
+        mvc_filenames.append(filename)
     return mvc_files, mvc_filenames
 
 
+def _cumulative_sum(data, axis):
+    """
+    Compute the cumulative sum of the data along the time axis, moved last, with a leading zero.
+
+    The sum of the samples in [start, start + window_size) is then
+    `cumulative_sum[..., start + window_size] - cumulative_sum[..., start]`.
+    """
+    data = np.moveaxis(np.asarray(data, dtype=float), axis, -1)
+    cumulative_sum = np.zeros(data.shape[:-1] + (data.shape[-1] + 1,))
+    np.cumsum(data, axis=-1, out=cumulative_sum[..., 1:])
+    return cumulative_sum
+
+
+def _find_best_window(cumulative_sum, window_size, allow_short=False):
+    """
+    Find the window of the given size with the highest mean value, from a cumulative sum.
+
+    Args:
+        cumulative_sum (ndarray): Cumulative sum computed by `_cumulative_sum`.
+        window_size (int): Number of samples in the window.
+        allow_short (bool, optional): If True, data shorter than the window gets a value of -inf (with a start index of 0)
+            instead of raising an error. Default is False.
+
+    Returns:
+        tuple: The maximum mean value of each channel and the start index of the window where it occurs.
+    """
+    num_samples = cumulative_sum.shape[-1] - 1
+    if allow_short and window_size >= 1 and window_size > num_samples:
+        # As in a search over no windows: the data can never be selected as the MVC
+        shape = cumulative_sum.shape[:-1]
+        return np.full(shape, -np.inf), np.zeros(shape, dtype=int)
+    if window_size < 1 or window_size > num_samples:
+        raise ValueError(
+            f"Error: a window of {window_size} samples does not fit in {num_samples} samples"
+        )
+
+    window_means = (
+        cumulative_sum[..., window_size:] - cumulative_sum[..., :-window_size]
+    ) / window_size
+
+    start_indices = np.argmax(window_means, axis=-1)
+    max_mean_values = np.take_along_axis(
+        window_means, start_indices[..., np.newaxis], axis=-1
+    )[..., 0]
+    return max_mean_values, start_indices
+
+
+def calculate_mvc_windows(
+    data, sampling_frequency, window_duration=0.5, axis=-1, allow_short=False
+):
+    """
+    Find the window with the highest mean value for every channel at once.
+
+    The mean of every window is computed from a cumulative sum in a single vectorized pass, so the
+    cost is linear in the number of samples and independent of the window duration.
+
+    Args:
+        data (ndarray): MVC data (usually the envelope), either a single channel or a (channels, samples) array.
+        sampling_frequency (int): The sampling frequency of the data.
+        window_duration (float, optional): Duration (in seconds) of the window over which to average the data. Default is 0.5 seconds.
+        axis (int, optional): Time axis of the data. Default is -1.
+        allow_short (bool, optional): If True, data shorter than the window gets an MVC value of -inf instead of raising
+            an error, so that it is never selected. Default is False.
+
+    Returns:
+        tuple: The maximum mean value (MVC value) of each channel and the start index of the window where it occurs.
+    """
+    window_size = int(window_duration * sampling_frequency)
+    return _find_best_window(_cumulative_sum(data, axis), window_size, allow_short)
+
+
+def calculate_mvc_window_sweep(
+    data, sampling_frequency, window_durations, axis=-1, allow_short=False
+):
+    """
+    Find the window with the highest mean value for several window durations at once.
+
+    The cumulative sum of the data is computed once and shared by all the window durations.
+
+    Args:
+        data (ndarray): MVC data (usually the envelope), either a single channel or a (channels, samples) array.
+        sampling_frequency (int): The sampling frequency of the data.
+        window_durations (list): Durations (in seconds) of the windows.
+        axis (int, optional): Time axis of the data. Default is -1.
+        allow_short (bool, optional): If True, the window durations longer than the data get an MVC value of -inf
+            instead of raising an error. Default is False.
+
+    Returns:
+        tuple: Two arrays with one row per window duration: the maximum mean value (MVC value) of each channel
+        and the start index of the window where it occurs.
+    """
+    cumulative_sum = _cumulative_sum(data, axis)
+    results = [
+        _find_best_window(
+            cumulative_sum, int(duration * sampling_frequency), allow_short
+        )
+        for duration in window_durations
+    ]
+    max_mean_values = np.array([values for values, _ in results])
+    start_indices = np.array([starts for _, starts in results])
+    return max_mean_values, start_indices
+
+
 def calculate_mvc_for_channel(data, sampling_frequency, window_duration=0.5):
     """
     Calculate the MVC value for a given channel by averaging the data over a specified window duration and
@@ -70,16 +236,8 @@ def calculate_mvc_for_channel(data, sampling_frequency, window_duration=0.5):
     Returns:
         float: Maximum mean value (MVC value) for the channel.
     """
-    window_size = int(window_duration * sampling_frequency)
-    max_mean_value = float("-inf")
-
-    for start_index in range(0, len(data) - window_size):
-        end_index = start_index + window_size
-        windowed_data = data[start_index:end_index]
-        mean_value = np.mean(windowed_data)
-        if mean_value > max_mean_value:
-            max_mean_value = mean_value
-    return max_mean_value
+    max_mean_value, _ = calculate_mvc_windows(data, sampling_frequency, window_duration)
+    return float(max_mean_value)
 
 
 def _calculate_mvc_for_each_channel_fixed(directory_path):
@@ -90,22 +248,186 @@ def _calculate_mvc_for_each_channel_fixed(directory_path):
         directory_path (str): Path to the directory containing MVC files.
 
     Returns:
-        tuple: A tuple containing an array of MVC values for each channel and a list of selected file paths.
+        tuple: A tuple containing an array of MVC values for each channel, a list of selected file paths and the
+        start index of the MVC window of each channel.
     """
     selected_file_paths = auto_select_files_for_channels(directory_path)
     channel_names = get_channel_names(directory_path)
 
-    max_mvc_values = []
+    max_mvc_values = np.zeros(len(channel_names))
+    mvc_window_starts = np.zeros(len(channel_names), dtype=int)
 
-    for i, channel_name in enumerate(channel_names):
-        filepath = os.path.join(directory_path, selected_file_paths[i])
-        mat = loadmat(filepath)
-        data = mat["data"]
-        channel_data = data[i, :]
-        mvc_value = process_mvc_data_for_channel(channel_data)
-        max_mvc_values.append(mvc_value)
+    # Load each selected file once and search all the channels that use it in a single pass
+    channels_per_file = {}
+    for i, _ in enumerate(channel_names):
+        channels_per_file.setdefault(selected_file_paths[i], []).append(i)
+
+    for filename, channel_indices in channels_per_file.items():
+        filepath = os.path.join(directory_path, filename)
+        data = load_mvc_data(filepath, channel_indices, decode=False)
+        mvc_envelope = extract_envelope(data, sampling_frequency)
+        mvc_values, window_starts = calculate_mvc_windows(
+            mvc_envelope, sampling_frequency
+        )
+        max_mvc_values[channel_indices] = mvc_values
+        mvc_window_starts[channel_indices] = window_starts
+
+    return max_mvc_values, selected_file_paths, mvc_window_starts
+
+
+def _score_mvc_data(data, window_durations):
+    """
+    Compute the windowed-max MVC score of every channel of a single MVC recording.
+
+    Recordings too short for a window (e.g. aborted MVCs) score -inf, so they are never selected and do not prevent
+    the other files of the session from being scored.
 
-    return np.array(max_mvc_values), selected_file_paths
+    Args:
+        data (ndarray): The (channels, samples) raw MVC data.
+        window_durations (list): Durations (in seconds) of the MVC windows.
+
+    Returns:
+        tuple: Two (durations, channels) arrays: the MVC scores and the start index of the window where they occur.
+    """
+    mvc_envelope = extract_envelope(data, sampling_frequency)
+    return calculate_mvc_window_sweep(
+        mvc_envelope, sampling_frequency, window_durations, allow_short=True
+    )
+
+
+def _score_mvc_file(filepath, num_channels, window_durations):
+    """
+    Load a single MVC file and compute the windowed-max MVC score of its first `num_channels` channels.
+
+    Args:
+        filepath (str): Path to the MVC file.
+        num_channels (int): Number of channels to be scored.
+        window_durations (list): Durations (in seconds) of the MVC windows.
+
+    Returns:
+        tuple: Two (durations, channels) arrays: the MVC scores and the start index of the window where they occur.
+    """
+    data = load_mvc_data(filepath, slice(0, num_channels), decode=False)
+    return _score_mvc_data(data, window_durations)
+
+
+def _compute_mvc_scores(directory_path, window_durations, max_workers):
+    """
+    Compute the MVC score of every channel in every MVC file of a directory, for several window durations.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+        window_durations (list): Durations (in seconds) of the MVC windows.
+        max_workers (int): Number of worker processes. With 1 the files are streamed in the current process.
+
+    Returns:
+        tuple: A (files, durations, channels) array of MVC scores, a (files, durations, channels) array with the start index
+        of the best window, and the list of MVC filenames corresponding to the first axis.
+    """
+    num_channels = len(get_channel_names(directory_path))
+    mvc_filenames = get_mvc_filenames(directory_path)
+    shape = (len(mvc_filenames), len(window_durations), num_channels)
+    scores = np.zeros(shape)
+    window_starts = np.zeros(shape, dtype=int)
+
+    if max_workers == 1:
+        channels = slice(0, num_channels)
+        for j, (_, data) in enumerate(iter_mvc_files(directory_path, channels)):
+            scores[j], window_starts[j] = _score_mvc_data(data, window_durations)
+        return scores, window_starts, mvc_filenames
+
+    filepaths = [os.path.join(directory_path, filename) for filename in mvc_filenames]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            _score_mvc_file,
+            filepaths,
+            [num_channels] * len(filepaths),
+            [list(window_durations)] * len(filepaths),
+        )
+        for j, (file_scores, file_window_starts) in enumerate(results):
+            scores[j], window_starts[j] = file_scores, file_window_starts
+
+    return scores, window_starts, mvc_filenames
+
+
+def compute_mvc_score_matrix(directory_path, window_duration=0.5, max_workers=None):
+    """
+    Compute the MVC score of every channel in every MVC file of a directory.
+
+    Each file is loaded and processed exactly once, and the files are processed in parallel. Every worker
+    holds one recording at a time, so the peak memory is about `max_workers` recordings; with `max_workers=1`
+    the files are streamed one at a time in the current process.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+        window_duration (float, optional): Duration (in seconds) of the MVC window. Default is 0.5 seconds.
+        max_workers (int, optional): Number of worker processes. Default is the number of CPUs.
+
+    Returns:
+        tuple: A (files, channels) matrix of MVC scores, a (files, channels) matrix with the start index of the best window,
+        and the list of MVC filenames corresponding to the rows.
+    """
+    scores, window_starts, mvc_filenames = _compute_mvc_scores(
+        directory_path, [window_duration], max_workers
+    )
+    return scores[:, 0, :], window_starts[:, 0, :], mvc_filenames
+
+
+def compute_mvc_window_sweep(
+    directory_path, window_durations=(0.25, 0.5, 1, 2), max_workers=None
+):
+    """
+    Compute the MVC score of every channel in every MVC file of a directory for several window durations.
+
+    Each file is processed once, and all the window durations are scored from the same cumulative sum of its envelope.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+        window_durations (list, optional): Durations (in seconds) of the MVC windows. Default is 0.25, 0.5, 1 and 2 seconds.
+        max_workers (int, optional): Number of worker processes. Default is the number of CPUs.
+
+    Returns:
+        pd.DataFrame: Tidy table with one row per file, channel and window duration, with the MVC value and the start
+        (in seconds, from the start of the trimmed envelope) of the window where it occurs.
+    """
+    channel_names = get_channel_names(directory_path)
+    scores, window_starts, mvc_filenames = _compute_mvc_scores(
+        directory_path, list(window_durations), max_workers
+    )
+
+    rows = []
+    for j, mvc_filename in enumerate(mvc_filenames):
+        for k, window_duration in enumerate(window_durations):
+            for i, channel_name in enumerate(channel_names):
+                rows.append(
+                    {
+                        "MVC File": mvc_filename,
+                        "Channel Name": channel_name,
+                        "Window Duration (s)": window_duration,
+                        "MVC Value": scores[j, k, i],
+                        "Window Start (s)": window_starts[j, k, i] / sampling_frequency,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def select_mvc_from_score_matrix(scores, mvc_filenames):
+    """
+    Select, for each channel, the MVC file with the highest score.
+
+    Args:
+        scores (ndarray): A (files, channels) matrix of MVC scores, see `compute_mvc_score_matrix`.
+        mvc_filenames (list): List of MVC filenames corresponding to the rows of the matrix.
+
+    Returns:
+        tuple: The MVC value of each channel, the index of the selected file for each channel and the exercise names of the selected files.
+    """
+    best_file_indices = np.argmax(scores, axis=0)
+    max_mvc_values = scores[best_file_indices, np.arange(scores.shape[1])]
+    mvc_exercise_names_for_channels = [
+        get_exercise_name(mvc_filenames[j]) for j in best_file_indices
+    ]
+    return max_mvc_values, best_file_indices, mvc_exercise_names_for_channels
 
 
 def _calculate_mvc_for_each_channel_automatic(directory_path):
@@ -117,52 +439,122 @@ def _calculate_mvc_for_each_channel_automatic(directory_path):
         directory_path (str): Path to the directory containing MVC files.
 
     Returns:
-        tuple: A tuple containing an array of MVC values for each channel and a list of exercise names corresponding to each value.
+        tuple: A tuple containing an array of MVC values for each channel, a list of exercise names corresponding to each value
+        and the start index of the MVC window of each channel.
     """
-    mvc_datas, mvc_filenames = get_mvc_files(directory_path)
-    channel_names = get_channel_names(directory_path)
+    scores, window_starts, mvc_filenames = compute_mvc_score_matrix(directory_path)
+    max_mvc_values, best_file_indices, mvc_exercise_names_for_channels = (
+        select_mvc_from_score_matrix(scores, mvc_filenames)
+    )
+    mvc_window_starts = window_starts[best_file_indices, np.arange(scores.shape[1])]
+    return max_mvc_values, mvc_exercise_names_for_channels, mvc_window_starts
 
-    max_mvc_values = []
-    mvc_exercise_names_for_channels = []
 
-    for i, channel_name in enumerate(channel_names):
-        max_mvc_value = float("-inf")
-        max_mvc_value_index = 0
+# Name of the file storing the MVC values inside each participant directory
+mvc_cache_filename = "mvc_cache.json"
 
-        for j, mvc_data in enumerate(mvc_datas):
-            channel_data = mvc_data[i, :]
-            mvc_value = process_mvc_data_for_channel(channel_data)
+# Bump when the MVC computation changes in a way not captured by the signature
+mvc_cache_version = 1
 
-            if mvc_value > max_mvc_value:
-                max_mvc_value = mvc_value
-                max_mvc_value_index = j
 
-        max_mvc_values.append(max_mvc_value)
-        mvc_exercise_names_for_channels.append(
-            get_exercise_name(mvc_filenames[max_mvc_value_index])
-        )
+def get_mvc_cache_signature(directory_path):
+    """
+    Describe everything the MVC values of a directory depend on.
 
-    return np.array(max_mvc_values), mvc_exercise_names_for_channels
+    The signature contains the size and modification time of every .mat file and of `channel_config.txt`,
+    the format of the samples of each .mat file (see `get_stored_recording_format`) and the pipeline parameters,
+    so any change to them, including converting the recordings to a compact store, invalidates the cached MVC values.
+
+    Args:
+        directory_path (str): Path to the directory containing MVC files.
+
+    Returns:
+        dict: Signature of the directory.
+    """
+    files = {}
+    for entry in os.scandir(directory_path):
+        if entry.name.endswith(".mat") or entry.name == "channel_config.txt":
+            stat = entry.stat()
+            files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+            if entry.name.endswith(".mat"):
+                files[entry.name].append(get_stored_recording_format(entry.path))
+
+    return {
+        "version": mvc_cache_version,
+        "pipeline": get_pipeline_parameters(sampling_frequency),
+        "files": files,
+    }
+
+
+def _load_mvc_cache(directory_path):
+    """Read the MVC cache of a directory, returning an empty cache if it is missing or corrupted."""
+    try:
+        with open(os.path.join(directory_path, mvc_cache_filename), "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_mvc_cache(directory_path, cache):
+    """Write the MVC cache of a directory, ignoring directories that are not writable."""
+    cache_path = os.path.join(directory_path, mvc_cache_filename)
+    temporary_path = f"{cache_path}.tmp"
+    try:
+        with open(temporary_path, "w") as file:
+            json.dump(cache, file, indent=2)
+        os.replace(temporary_path, cache_path)
+    except OSError as error:
+        print(f"Could not save the MVC cache in {directory_path}: {error}")
 
 
 use_automatic = False  # Set to False to use the "fixed" version. You can change this based on your preference.
 
 
-def calculate_mvc_for_each_channel(directory_path, use_automatic=False):
+def calculate_mvc_for_each_channel(directory_path, use_automatic=False, use_cache=True):
     """
     Calculate MVC values for each channel, either using a fixed or automatic file selection.
 
+    The MVC values, their source files and window locations are stored in `mvc_cache.json` inside the directory,
+    and reused as long as the .mat files, `channel_config.txt` and the pipeline parameters do not change.
+
     Args:
         directory_path (str): Path to the directory containing MVC files.
         use_automatic (bool, optional): If True, uses automatic file selection. Default is False for fixed file selection.
+        use_cache (bool, optional): If True, reads and updates the MVC cache of the directory. Default is True.
 
     Returns:
         tuple: MVC values for each channel and corresponding file paths or exercise names.
     """
+    strategy = "automatic" if use_automatic else "fixed"
+
+    if use_cache:
+        signature = get_mvc_cache_signature(directory_path)
+        cache = _load_mvc_cache(directory_path)
+        if cache.get("signature") != signature:
+            cache = {"signature": signature}
+        if strategy in cache:
+            entry = cache[strategy]
+            return np.array(entry["mvc_values"]), entry["sources"]
+
     if use_automatic:
-        return _calculate_mvc_for_each_channel_automatic(directory_path)
+        mvc_values, sources, window_starts = _calculate_mvc_for_each_channel_automatic(
+            directory_path
+        )
     else:
-        return _calculate_mvc_for_each_channel_fixed(directory_path)
+        mvc_values, sources, window_starts = _calculate_mvc_for_each_channel_fixed(
+            directory_path
+        )
+
+    if use_cache:
+        cache[strategy] = {
+            "mvc_values": [float(value) for value in mvc_values],
+            "sources": list(sources),
+            "window_starts": [int(start) for start in window_starts],
+        }
+        _save_mvc_cache(directory_path, cache)
+
+    return mvc_values, sources
 
 
 def select_files_for_channels_gui(directory_path):
@@ -303,11 +695,21 @@ if __name__ == "__main__":
     directory_path = filedialog.askdirectory(title="Select MVC Files directory")
     root.destroy()
 
-    max_mvc_values, mvc_exercise_names_for_channels = calculate_mvc_for_each_channel(
-        directory_path
-    )
-
+    # Score every channel of every MVC file once; the selection and the printout both read from it
+    scores, _, mvc_filenames = compute_mvc_score_matrix(directory_path)
     channel_names = get_channel_names(directory_path)
+
+    if use_automatic:
+        max_mvc_values, _, mvc_exercise_names_for_channels = (
+            select_mvc_from_score_matrix(scores, mvc_filenames)
+        )
+    else:
+        mvc_exercise_names_for_channels = auto_select_files_for_channels(directory_path)
+        max_mvc_values = [
+            scores[mvc_filenames.index(filename), i]
+            for i, filename in enumerate(mvc_exercise_names_for_channels)
+        ]
+
     print("Max MVC Values and Filenames for Each Channel:")
     for i, (value, filename) in enumerate(
         zip(max_mvc_values, mvc_exercise_names_for_channels)
@@ -316,10 +718,7 @@ if __name__ == "__main__":
         print(f"{channel_name}: Max Value = {value}, Filename = {filename}")
 
     print("\nAll MVC Values Calculated:")
-    mvc_datas, mvc_filenames = get_mvc_files(directory_path)
     for i, channel_name in enumerate(channel_names):
         print(f"{channel_name}:")
-        for j, mvc_data in enumerate(mvc_datas):
-            channel_data = mvc_data[i, :]
-            mvc_value = process_mvc_data_for_channel(channel_data)
-            print(f"  File {j+1} ({mvc_filenames[j]}): {mvc_value}")
+        for j, mvc_filename in enumerate(mvc_filenames):
+            print(f"  File {j+1} ({mvc_filename}): {scores[j, i]}")
@@ -0,0 +1,96 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of files loaded ahead of the one being processed
+default_prefetch = 2
+
+# Maximum size of the files loaded ahead of the one being processed
+default_max_prefetch_bytes = 2 * 1024**3
+
+_end = object()
+
+
+def get_file_size(filepath):
+    """
+    Estimate the memory needed to load a file from its size on disk.
+
+    Args:
+        filepath (str): Path to the file.
+
+    Returns:
+        int: Size of the file in bytes, or 0 if it cannot be read.
+    """
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+def prefetch_map(
+    function,
+    items,
+    prefetch=default_prefetch,
+    max_bytes=default_max_prefetch_bytes,
+    get_size=get_file_size,
+):
+    """
+    Apply a function to each item, computing the next items on a thread pool while the current one is used.
+
+    This overlaps the loading of the next files with the processing of the current one, which hides most of
+    the read latency on network-mounted study folders. Reading files, hashing and the scipy filters release
+    the GIL, so threads are enough. The results are yielded in the order of `items`.
+
+    The size of the items loaded ahead is capped by `max_bytes`, estimated with `get_size` (by default the
+    size of each file on disk, which underestimates the memory taken by compressed files: recordings use
+    `recording_reader.get_recording_size` instead). At least one item is always loaded ahead, even if it is
+    larger than the cap.
+
+    Example:
+        for filepath, data in prefetch_map(load_recording, filepaths):
+            ...
+
+    Args:
+        function (callable): Function applied to each item, e.g. a loader taking a file path.
+        items (iterable): The items, e.g. the file paths returned by `get_mat_filenames`.
+        prefetch (int, optional): Maximum number of items loaded ahead. With 0 the items are processed sequentially. Default is 2.
+        max_bytes (int, optional): Maximum size of the items loaded ahead. Default is 2 GB.
+        get_size (callable, optional): Function estimating the size of an item. Default is the size of the file on disk.
+
+    Yields:
+        tuple: Each item and the result of the function.
+    """
+    items = iter(items)
+    if prefetch < 1:
+        for item in items:
+            yield item, function(item)
+        return
+
+    next_item = next(items, _end)
+    pending = deque()
+    pending_bytes = 0
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+
+        def load_ahead():
+            """Submit as many items as allowed by the number and memory caps."""
+            nonlocal next_item, pending_bytes
+            while next_item is not _end and len(pending) < prefetch:
+                size = get_size(next_item)
+                if pending and pending_bytes + size > max_bytes:
+                    break
+                pending.append((next_item, size, executor.submit(function, next_item)))
+                pending_bytes += size
+                next_item = next(items, _end)
+
+        try:
+            load_ahead()
+            while pending:
+                item, size, future = pending.popleft()
+                pending_bytes -= size
+                # Start loading the next items before waiting for the current one
+                load_ahead()
+                yield item, future.result()
+        finally:
+            # Do not load the remaining items if the iteration is interrupted
+            for _, _, future in pending:
+                future.cancel()
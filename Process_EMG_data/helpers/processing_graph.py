@@ -0,0 +1,126 @@
+from Process_EMG_data.helpers.filtering import (
+    butter_bandpass_filter,
+    butter_lowpass_filter,
+    notch_mains_interference,
+)
+from Process_EMG_data.helpers.rectify_signal import rectify_signal
+from Process_EMG_data.helpers.amplifier_config import (
+    highcut,
+    lowcut,
+    mains_frequency,
+    envelope_cutoff,
+)
+from Process_EMG_data.helpers.utilis import trim_data
+from Process_EMG_data.helpers.apply_processing_pipeline import normalize_envelope
+
+
+class ProcessingGraph:
+    """
+    Intermediate stages of the processing pipeline for a single recording.
+
+    The stages are computed lazily, each one from the stage before it, and every stage is computed
+    at most once:
+
+        raw -> trimmed -> bandpassed -> notch_filtered -> rectified -> envelope -> normalized
+
+    A script that needs several stages (e.g. the filtered signal and the envelope) therefore filters
+    the raw data only once. The "envelope" stage is identical to the output of `extract_envelope`
+    and the "normalized" stage to the output of `normalize_signal`.
+
+    Example:
+        graph = ProcessingGraph(raw_data, sampling_frequency)
+        filtered_data = graph["notch_filtered"]
+        envelope_data = graph["envelope"]  # reuses the filtered data
+    """
+
+    stages = (
+        "raw",
+        "trimmed",
+        "bandpassed",
+        "notch_filtered",
+        "rectified",
+        "envelope",
+        "normalized",
+    )
+
+    def __init__(self, data, sampling_frequency, mvc=None, axis=-1):
+        """
+        Args:
+            data (np.array): The raw EMG data, either a single channel or a (channels, samples) array.
+            sampling_frequency (int): The sampling frequency of the signal.
+            mvc (float or array, optional): MVC value(s) used by the "normalized" stage.
+            axis (int, optional): Time axis of the data. Default is -1.
+        """
+        self.sampling_frequency = sampling_frequency
+        self.mvc = mvc
+        self.axis = axis
+        self._results = {"raw": data}
+
+    def _compute(self, stage):
+        """
+        Compute a stage from the stage before it.
+
+        Args:
+            stage (str): Name of the stage.
+
+        Returns:
+            np.array: The data at the given stage.
+        """
+        fs = self.sampling_frequency
+        axis = self.axis
+        if stage == "trimmed":
+            return trim_data(self["raw"], fs, axis=axis)
+        if stage == "bandpassed":
+            return butter_bandpass_filter(
+                self["trimmed"], lowcut, highcut, fs, axis=axis
+            )
+        if stage == "notch_filtered":
+            return notch_mains_interference(
+                self["bandpassed"], mains_frequency, fs, axis=axis
+            )
+        if stage == "rectified":
+            return rectify_signal(self["notch_filtered"])
+        if stage == "envelope":
+            return butter_lowpass_filter(
+                self["rectified"], envelope_cutoff, fs, axis=axis
+            )
+        if stage == "normalized":
+            if self.mvc is None:
+                raise ValueError(
+                    "Error: an MVC value is needed to normalize the signal"
+                )
+            return normalize_envelope(self["envelope"], self.mvc, axis=axis)
+        raise KeyError(
+            f"Unknown processing stage {stage}, expected one of {self.stages}"
+        )
+
+    def __getitem__(self, stage):
+        """
+        Get the data at the given stage, computing it (and the stages before it) if needed.
+
+        Args:
+            stage (str): Name of the stage, one of `ProcessingGraph.stages`.
+
+        Returns:
+            np.array: The data at the given stage.
+        """
+        if stage not in self._results:
+            self._results[stage] = self._compute(stage)
+        return self._results[stage]
+
+    def is_computed(self, stage):
+        """Return True if the given stage has already been computed."""
+        return stage in self._results
+
+    def release(self, *stages):
+        """
+        Free the memory used by the given stages once they are no longer needed.
+
+        Released stages are recomputed if they are requested again.
+
+        Args:
+            *stages (str): Names of the stages to release. The raw data is never released.
+        """
+        for stage in stages:
+            if stage != "raw":
+                self._results.pop(stage, None)
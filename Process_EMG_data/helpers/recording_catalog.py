@@ -0,0 +1,257 @@
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from Process_EMG_data.helpers.utilis import parse_recording_filename
+
+# Name of the file storing the catalog inside the study root
+catalog_filename = "recording_catalog.json"
+
+# Bump when the catalog format or the filename parsing changes
+catalog_version = 1
+
+catalog_columns = [
+    "directory",
+    "filepath",
+    "filename",
+    "participant_type",
+    "participant_group",
+    "exercise_name",
+    "date",
+    "time",
+    "rep",
+    "channel_names",
+]
+
+
+def get_participant_group(participant_type):
+    """
+    Get the group of a participant from its type, e.g. "YT" for "YT1" or for the session directory "YT1_testing_6_MAT".
+
+    Args:
+        participant_type (str): The partecipant type (e.g. YT1), optionally followed by "_" and a description.
+
+    Returns:
+        str: The participant type without the trailing participant number.
+    """
+    return participant_type.split("_")[0].rstrip("0123456789")
+
+
+def _read_channel_names(directory_path):
+    """Read the channel names of a directory, or return None if it has no channel configuration."""
+    try:
+        with open(os.path.join(directory_path, "channel_config.txt"), "r") as file:
+            return [line.strip() for line in file.readlines()]
+    except OSError:
+        return None
+
+
+def _get_mtime_ns(path):
+    """Return the modification time of a path, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class RecordingCatalog:
+    """
+    Index of all the .mat recordings of a study.
+
+    The study root and its immediate subdirectories (e.g. the "YT1_MAT" participant directories) are scanned once
+    with `os.scandir`, and every recording filename is parsed into participant, exercise, date, time and repetition,
+    together with the channel configuration of its directory. The catalog is stored in `recording_catalog.json`
+    inside the study root and refreshed incrementally: only the directories whose modification time (or whose
+    `channel_config.txt`) changed since the last scan are listed and parsed again.
+
+    Example:
+        catalog = RecordingCatalog(study_root)
+        filenames = catalog.get_filenames(participant_group="YT", exercise_name="tadasana")
+    """
+
+    def __init__(self, study_root, catalog_path=None, refresh=True):
+        """
+        Args:
+            study_root (str): Directory containing the participant directories.
+            catalog_path (str, optional): Where the catalog is stored. Default is `recording_catalog.json` in the study root.
+            refresh (bool, optional): If True, rescans the directories that changed. Default is True.
+        """
+        self.study_root = os.path.abspath(study_root)
+        self.catalog_path = catalog_path or os.path.join(
+            self.study_root, catalog_filename
+        )
+        self._directories = self._load()
+        self._table = None
+        if refresh:
+            self.refresh()
+
+    def _load(self):
+        """Load the stored catalog, returning an empty one if it is missing, outdated or corrupted."""
+        try:
+            with open(self.catalog_path, "r") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if stored.get("version") != catalog_version:
+            return {}
+        return stored.get("directories", {})
+
+    def _save(self):
+        """Write the catalog atomically, ignoring locations that are not writable."""
+        directory = os.path.dirname(self.catalog_path)
+        try:
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=directory, suffix=".tmp"
+            )
+            with os.fdopen(file_descriptor, "w") as file:
+                json.dump(
+                    {"version": catalog_version, "directories": self._directories},
+                    file,
+                )
+            os.replace(temporary_path, self.catalog_path)
+        except OSError as error:
+            print(f"Could not save the recording catalog in {directory}: {error}")
+
+    def _scan_directory(self, directory_path):
+        """
+        List and parse the recordings of a single directory.
+
+        Args:
+            directory_path (str): Path to the directory.
+
+        Returns:
+            list: One dictionary per recording, with the fields of the catalog.
+        """
+        channel_names = _read_channel_names(directory_path)
+        recordings = []
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(".mat"):
+                    continue
+                try:
+                    info = parse_recording_filename(entry.name)
+                except ValueError:
+                    continue
+                recordings.append(
+                    {
+                        "directory": directory_path,
+                        "filepath": entry.path,
+                        "filename": entry.name,
+                        "participant_type": info.participant_type,
+                        "participant_group": get_participant_group(
+                            info.participant_type
+                        ),
+                        "exercise_name": info.exercise_name,
+                        "date": info.date,
+                        "time": info.time,
+                        "rep": info.rep,
+                        "channel_names": channel_names,
+                    }
+                )
+        return sorted(recordings, key=lambda recording: recording["filepath"])
+
+    def refresh(self):
+        """
+        Rescan the directories that changed since the last scan and save the catalog if anything changed.
+
+        Returns:
+            bool: True if the catalog changed.
+        """
+        directory_paths = [self.study_root]
+        with os.scandir(self.study_root) as entries:
+            directory_paths += sorted(entry.path for entry in entries if entry.is_dir())
+
+        directories = {}
+        changed = False
+        for directory_path in directory_paths:
+            stored = self._directories.get(directory_path)
+            if directory_path == self.study_root:
+                # The catalog itself is saved in the study root, which changes its modification time,
+                # so the few files of the root are always listed again
+                signature = None
+                recordings = self._scan_directory(directory_path)
+                if stored and stored["recordings"] == recordings:
+                    directories[directory_path] = stored
+                    continue
+            else:
+                signature = [
+                    _get_mtime_ns(directory_path),
+                    _get_mtime_ns(os.path.join(directory_path, "channel_config.txt")),
+                ]
+                if stored and stored["signature"] == signature:
+                    directories[directory_path] = stored
+                    continue
+                recordings = self._scan_directory(directory_path)
+
+            # Empty directories are remembered too, so they are not listed again
+            directories[directory_path] = {
+                "signature": signature,
+                "recordings": recordings,
+            }
+            changed = True
+
+        if changed or directories.keys() != self._directories.keys():
+            self._directories = directories
+            self._table = None
+            self._save()
+            return True
+        return False
+
+    @property
+    def table(self):
+        """pd.DataFrame: One row per recording, sorted by file path."""
+        if self._table is None:
+            recordings = [
+                recording
+                for directory in self._directories.values()
+                for recording in directory["recordings"]
+            ]
+            self._table = (
+                pd.DataFrame(recordings, columns=catalog_columns)
+                .sort_values("filepath")
+                .reset_index(drop=True)
+            )
+        return self._table
+
+    def query(self, **conditions):
+        """
+        Select the recordings matching all the given conditions.
+
+        Each condition is a column of the catalog and either a value or a list of accepted values, e.g.
+        `catalog.query(participant_group="YT", rep=[1, 2])`.
+
+        Returns:
+            pd.DataFrame: The matching rows of the catalog.
+        """
+        table = self.table
+        mask = pd.Series(True, index=table.index)
+        for column, value in conditions.items():
+            if column not in table.columns:
+                raise KeyError(
+                    f"Unknown catalog column {column}, expected one of {catalog_columns}"
+                )
+            if isinstance(value, (list, tuple, set)):
+                mask &= table[column].isin(list(value))
+            else:
+                mask &= table[column] == value
+        return table[mask]
+
+    def get_filenames(self, **conditions):
+        """
+        Get the paths of the recordings matching all the given conditions, see `query`.
+
+        Returns:
+            list: Sorted full paths of the matching recordings.
+        """
+        return list(self.query(**conditions)["filepath"])
+
+    def get_directories(self, **conditions):
+        """
+        Get the directories containing recordings matching all the given conditions, see `query`.
+
+        Returns:
+            list: Sorted paths of the matching directories.
+        """
+        return sorted(set(self.query(**conditions)["directory"]))
@@ -0,0 +1,295 @@
+import numpy as np
+from scipy.io import loadmat, whosmat
+
+from Process_EMG_data.helpers.compact_recording import CompactRecording
+from Process_EMG_data.helpers.prefetch import (
+    default_max_prefetch_bytes,
+    default_prefetch,
+    get_file_size,
+    prefetch_map,
+)
+from Process_EMG_data.helpers.recording_store import (
+    load_stored_recording,
+    read_store_metadata,
+)
+
+try:
+    import h5py
+except ImportError:  # h5py is only needed for MATLAB v7.3 files
+    h5py = None
+
+# MATLAB v7.3 files are HDF5 files with a 512 bytes header, followed by the HDF5 signature
+hdf5_signature = b"\x89HDF\r\n\x1a\n"
+hdf5_signature_offset = 512
+
+# Bytes per element of the MATLAB classes returned by `whosmat`
+matlab_class_sizes = {
+    "double": 8,
+    "single": 4,
+    "int8": 1,
+    "uint8": 1,
+    "int16": 2,
+    "uint16": 2,
+    "int32": 4,
+    "uint32": 4,
+    "int64": 8,
+    "uint64": 8,
+}
+
+
+def is_hdf5_mat_file(filepath):
+    """
+    Check whether a .mat file is a MATLAB v7.3 (HDF5) file.
+
+    Args:
+        filepath (str): Path to the .mat file.
+
+    Returns:
+        bool: True if the file is stored in the HDF5 format.
+    """
+    with open(filepath, "rb") as file:
+        file.seek(hdf5_signature_offset)
+        return file.read(len(hdf5_signature)) == hdf5_signature
+
+
+def _normalize_channel_index(channels, num_channels):
+    """
+    Convert a channel selection into something h5py can read, and the reordering to apply afterwards.
+
+    h5py only supports increasing lists of indices, so lists are read sorted and without duplicates, and
+    reordered in memory.
+
+    Returns:
+        tuple: The index to read from the file, and the index to apply to the result (or None).
+    """
+    if channels is None:
+        return slice(None), None
+    if isinstance(channels, slice):
+        return channels, None
+    if np.ndim(channels) == 0:
+        return int(channels) % num_channels, None
+
+    channels = np.asarray(channels) % num_channels
+    unique_channels, inverse = np.unique(channels, return_inverse=True)
+    return list(unique_channels), inverse
+
+
+class RecordingReader:
+    """
+    Read a recording stored in a .mat file, loading only what is needed.
+
+    Only the `data` variable is read. Recordings saved in the MATLAB v7.3 format are read through h5py, one
+    channel and time range at a time, so selecting a channel does not read the whole matrix from disk. Older
+    formats cannot be read partially by scipy: the `data` matrix is loaded on first access and kept in memory.
+
+    In both cases the data is exposed as a (channels, samples) array, as in the files saved by MATLAB
+    (HDF5 datasets are stored transposed and are transposed back).
+
+    Example:
+        with RecordingReader(filepath) as recording:
+            first_channel = recording[0]
+            first_seconds = recording[:, : 5 * sampling_frequency]
+    """
+
+    def __init__(self, filepath, variable_name="data"):
+        """
+        Args:
+            filepath (str): Path to the .mat file.
+            variable_name (str, optional): Name of the variable with the recording. Default is "data".
+        """
+        self.filepath = filepath
+        self.variable_name = variable_name
+        self.is_hdf5 = is_hdf5_mat_file(filepath)
+        self._data = None
+        self._file = None
+
+        if self.is_hdf5:
+            if h5py is None:
+                raise ImportError(
+                    f"h5py is required to read MATLAB v7.3 files such as {filepath}"
+                )
+            self._file = h5py.File(filepath, "r")
+            self._dataset = self._file[variable_name]
+
+    def _load(self):
+        """Load the whole variable of a non-HDF5 file, keeping it for later accesses."""
+        if self._data is None:
+            self._data = loadmat(self.filepath, variable_names=[self.variable_name])[
+                self.variable_name
+            ]
+        return self._data
+
+    @property
+    def shape(self):
+        """tuple: (channels, samples) shape of the recording."""
+        if self.is_hdf5:
+            return self._dataset.shape[::-1]
+        return self._load().shape
+
+    @property
+    def num_channels(self):
+        """int: Number of channels of the recording."""
+        return self.shape[0]
+
+    @property
+    def num_samples(self):
+        """int: Number of samples of the recording."""
+        return self.shape[1]
+
+    def read(self, channels=None, samples=None):
+        """
+        Read some channels and samples of the recording.
+
+        Args:
+            channels (int, slice or list, optional): Channels to be read. Default is all the channels.
+            samples (slice, optional): Samples to be read. Default is all the samples.
+
+        Returns:
+            np.array: The selected data, with the channels along the first axis (if several channels are selected).
+        """
+        if samples is None:
+            samples = slice(None)
+
+        if not self.is_hdf5:
+            data = self._load()
+            if channels is None:
+                return data[:, samples]
+            return data[channels, samples]
+
+        channel_index, reorder = _normalize_channel_index(channels, self.num_channels)
+        # The dataset is stored as (samples, channels)
+        data = np.asarray(self._dataset[samples, channel_index]).T
+        if reorder is not None:
+            data = data[reorder]
+        return data
+
+    def __getitem__(self, index):
+        """Read `recording[channels]` or `recording[channels, samples]`, see `read`."""
+        if isinstance(index, tuple):
+            channels, samples = index
+        else:
+            channels, samples = index, None
+        if isinstance(channels, slice) and channels == slice(None):
+            channels = None
+        return self.read(channels, samples)
+
+    def close(self):
+        """Release the file and the loaded data."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_recording(filepath, channels=None, samples=None, use_store=True, decode=True):
+    """
+    Load the `data` matrix of a .mat recording, optionally only some channels and samples.
+
+    If the recording was converted to the native recording store (see `recording_store`) and the .mat file did not
+    change since, the data is read from the store as a read-only memory map instead of parsing the .mat file.
+
+    Args:
+        filepath (str): Path to the .mat file, in any MATLAB format (v7.3 files require h5py).
+        channels (int, slice or list, optional): Channels to be loaded. Default is all the channels.
+        samples (slice, optional): Samples to be loaded. Default is all the samples.
+        use_store (bool, optional): If True, reads the converted recording when available. Default is True.
+        decode (bool, optional): If False, recordings stored in compact form are returned as a `CompactRecording`
+            instead of being converted to float64. Default is True.
+
+    Returns:
+        np.array or CompactRecording: The (channels, samples) recording.
+    """
+    if samples is None:
+        samples = slice(None)
+
+    if use_store:
+        data = load_stored_recording(filepath)
+        if isinstance(data, CompactRecording):
+            if channels is None:
+                data = data[:, samples]
+            else:
+                data = data[channels, samples]
+            return data.decode() if decode else data
+        if data is not None:
+            # Views of the memory map for integers and slices, copies for lists of channels
+            if channels is None:
+                return data[:, samples]
+            return data[channels, samples]
+
+    with RecordingReader(filepath) as recording:
+        data = recording.read(channels, samples)
+        # Do not keep a view on the whole matrix once the reader is closed
+        if not recording.is_hdf5 and (channels is not None or samples != slice(None)):
+            data = np.array(data)
+    return data
+
+
+def get_recording_size(filepath, variable_name="data"):
+    """
+    Estimate the memory taken by a recording once loaded, without loading it.
+
+    The size on disk underestimates it for compressed MATLAB v7 files, so the size is computed from the shape and
+    type of the `data` matrix instead, read from the store metadata, the HDF5 dataset or the .mat file header.
+    Compact stored recordings are counted as decoded to float64.
+
+    Args:
+        filepath (str): Path to the .mat file.
+        variable_name (str, optional): Name of the variable with the recording. Default is "data".
+
+    Returns:
+        int: Size of the loaded (channels, samples) array in bytes, or the size of the file if it cannot be read.
+    """
+    try:
+        metadata = read_store_metadata(filepath)
+        if metadata is not None:
+            item_size = (
+                8 if "gain" in metadata else np.dtype(metadata["dtype"]).itemsize
+            )
+            return int(np.prod(metadata["shape"])) * item_size
+
+        if is_hdf5_mat_file(filepath):
+            if h5py is None:
+                return get_file_size(filepath)
+            with h5py.File(filepath, "r") as file:
+                dataset = file[variable_name]
+                return int(dataset.size) * dataset.dtype.itemsize
+
+        for name, shape, matlab_class in whosmat(filepath):
+            if name == variable_name:
+                return int(np.prod(shape)) * matlab_class_sizes.get(matlab_class, 8)
+    except (OSError, ValueError, KeyError):
+        pass
+    return get_file_size(filepath)
+
+
+def iter_recordings(
+    filepaths,
+    channels=None,
+    prefetch=default_prefetch,
+    max_bytes=default_max_prefetch_bytes,
+):
+    """
+    Iterate over several recordings, loading the next ones on a thread pool while the current one is processed.
+
+    Args:
+        filepaths (list): Paths to the .mat files, e.g. as returned by `get_mat_filenames`.
+        channels (int, slice or list, optional): Channels to be loaded. Default is all the channels.
+        prefetch (int, optional): Maximum number of recordings loaded ahead. With 0 the recordings are loaded sequentially. Default is 2.
+        max_bytes (int, optional): Maximum size in memory of the recordings loaded ahead, see `get_recording_size`. Default is 2 GB.
+
+    Yields:
+        tuple: The path and the (channels, samples) data of each recording, in the order of `filepaths`.
+    """
+    return prefetch_map(
+        lambda filepath: load_recording(filepath, channels),
+        filepaths,
+        prefetch=prefetch,
+        max_bytes=max_bytes,
+        get_size=get_recording_size,
+    )
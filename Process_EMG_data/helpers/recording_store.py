@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from Process_EMG_data.helpers.compact_recording import CompactRecording
+
+# Name of the folder, inside each participant directory, containing the converted recordings
+store_directory_name = "npy_store"
+
+# Bump when the layout of the stored recordings changes
+store_format_version = 1
+
+
+def get_store_paths(mat_path):
+    """
+    Get where the converted version of a .mat recording is stored.
+
+    Args:
+        mat_path (str): Path to the .mat recording.
+
+    Returns:
+        tuple: Paths to the .npy file with the data and to the .json file with its metadata.
+    """
+    directory_path, filename = os.path.split(os.path.abspath(mat_path))
+    base_name = os.path.splitext(filename)[0]
+    store_directory = os.path.join(directory_path, store_directory_name)
+    return (
+        os.path.join(store_directory, f"{base_name}.npy"),
+        os.path.join(store_directory, f"{base_name}.json"),
+    )
+
+
+def _get_source_signature(mat_path):
+    """Describe the .mat file a stored recording was converted from."""
+    stat = os.stat(mat_path)
+    return {
+        "filename": os.path.basename(mat_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def read_store_metadata(mat_path):
+    """
+    Read the metadata of the converted version of a .mat recording.
+
+    Args:
+        mat_path (str): Path to the .mat recording.
+
+    Returns:
+        dict or None: The metadata, or None if the recording was not converted or the .mat file changed since.
+    """
+    _, metadata_path = get_store_paths(mat_path)
+    try:
+        with open(metadata_path, "r") as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        source = _get_source_signature(mat_path)
+    except OSError:
+        return None
+    if (
+        metadata.get("version") != store_format_version
+        or metadata.get("source") != source
+    ):
+        return None
+    return metadata
+
+
+def get_stored_recording_format(mat_path):
+    """
+    Describe the samples `load_recording` returns for a .mat recording.
+
+    Compact stored copies (see `compact_recording`) are lossy, so caches of values computed from a recording
+    include this description in their keys, to keep the results of the .mat samples and of the quantized
+    samples apart.
+
+    Args:
+        mat_path (str): Path to the .mat recording.
+
+    Returns:
+        dict or str: The type of the compact samples and a digest of their gains and offsets, or "mat" when the
+        samples are read from the .mat file or from a lossless copy of it.
+    """
+    metadata = read_store_metadata(mat_path)
+    if metadata is None or "gain" not in metadata:
+        return "mat"
+    scale = json.dumps([metadata["gain"], metadata["offset"]])
+    return {
+        "dtype": metadata["dtype"],
+        "scale": hashlib.sha256(scale.encode()).hexdigest()[:16],
+    }
+
+
+def write_stored_recording(mat_path, data, metadata=None):
+    """
+    Store a recording as a contiguous (channels, samples) .npy file with a JSON metadata sidecar.
+
+    The files are written through temporary files, so readers never see a partial recording. For compact
+    recordings, the compact samples are stored and their gain and offset are saved in the sidecar.
+
+    Args:
+        mat_path (str): Path to the .mat recording the data comes from.
+        data (np.array or CompactRecording): The (channels, samples) recording.
+        metadata (dict, optional): Additional metadata (e.g. channel names) stored in the sidecar.
+    """
+    data_path, metadata_path = get_store_paths(mat_path)
+    store_directory = os.path.dirname(data_path)
+    os.makedirs(store_directory, exist_ok=True)
+
+    sidecar = dict(metadata or {})
+    if isinstance(data, CompactRecording):
+        sidecar["gain"] = data.gain.tolist()
+        sidecar["offset"] = data.offset.tolist()
+        data = data.samples
+    data = np.ascontiguousarray(data)
+    sidecar.update(
+        {
+            "version": store_format_version,
+            "source": _get_source_signature(mat_path),
+            "shape": list(data.shape),
+            "dtype": data.dtype.str,
+        }
+    )
+
+    for path, write in [
+        (data_path, lambda file: np.save(file, data)),
+        (metadata_path, lambda file: file.write(json.dumps(sidecar).encode())),
+    ]:
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=store_directory, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                write(file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+
+def load_stored_recording(mat_path):
+    """
+    Open the converted version of a .mat recording as a read-only memory map.
+
+    Rows of the (channels, samples) memory map are contiguous on disk, so selecting a channel or a time range
+    returns a view without reading the rest of the recording, and processes opening the same recording share
+    the pages cached by the operating system.
+
+    Args:
+        mat_path (str): Path to the .mat recording.
+
+    Returns:
+        np.memmap, CompactRecording or None: The recording (a `CompactRecording` wrapping the memory map if it was
+        stored in compact form), or None if it was not converted or the .mat file changed since.
+    """
+    metadata = read_store_metadata(mat_path)
+    if metadata is None:
+        return None
+    data_path, _ = get_store_paths(mat_path)
+    try:
+        data = np.load(data_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if "gain" in metadata:
+        return CompactRecording(data, metadata["gain"], metadata["offset"])
+    return data
@@ -1,6 +1,6 @@
 import numpy as np
 
 
-def rectify_signal(signal):
-    """Rectify the given signal (take absolute value)."""
-    return np.abs(signal)
+def rectify_signal(signal, out=None):
+    """Rectify the given signal (take absolute value), optionally in place using `out`."""
+    return np.abs(signal, out=out)
@@ -1,115 +1,226 @@
 import numpy as np
-from scipy.stats import pearsonr
-import pandas as pd
-import pingouin as pg
-import os
+from scipy.stats import f as f_distribution
+
+
+def _report_invalid_rep_vectors(vectors_per_rep, exercise_name, rep_labels):
+    """Print the reps whose activations contain NaN or inf values, and return the mask of the valid reps."""
+    valid = np.all(np.isfinite(vectors_per_rep), axis=1)
+    if rep_labels is None:
+        rep_labels = [("", i + 1) for i in range(len(vectors_per_rep))]
+    for i in np.flatnonzero(~valid):
+        participant, rep_number = rep_labels[i]
+        print(
+            f"Exercise: {exercise_name}, Directory: {participant}, Rep: {rep_number} has problematic values: {vectors_per_rep[i]}"
+        )
+    return valid
+
+
+def _average_over_pairs(pair_matrix):
+    """Average a symmetric (reps, reps) matrix over each pair of distinct reps once."""
+    first, second = np.triu_indices(len(pair_matrix), k=1)
+    return np.mean(pair_matrix[first, second])
+
+
+def pearson_correlation_matrix(rep_vectors):
+    """Compute the Pearson correlation between every pair of reps.
+
+    The reps with NaN or inf values are masked before the computation, and their rows and columns are NaN.
+
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+
+    Returns:
+        np.array: The symmetric (reps, reps) correlation matrix.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
+    valid = np.all(np.isfinite(vectors_per_rep), axis=1)
+    correlation_matrix = np.full((len(vectors_per_rep), len(vectors_per_rep)), np.nan)
+    if np.any(valid):
+        # Constant reps have no defined correlation and give NaN, as with scipy.stats.pearsonr
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation_matrix[np.ix_(valid, valid)] = np.corrcoef(
+                vectors_per_rep[valid]
+            )
+    return correlation_matrix
 
 
 def average_pearson_coefficient_over_directories(
-    activations_by_directory, exercise_name
+    rep_vectors, exercise_name, rep_labels=None, return_matrix=False
 ):
     """Calculate the average Pearson correlation between reps of the same exercise
-    across directories based on their activations."""
-
-    correlations = []
-
-    # List of 8-dimensional vectors for each rep in every directory
-    vectors_per_rep = []
-    directory_rep_info = []  # Store directory and rep index for each vector
-
-    # Loop over all directories (i.e., sessions or individuals)
-    for (
-        directory_path,
-        channel_activations_by_directory,
-    ) in activations_by_directory.items():
-        # Number of reps (assuming all channels have the same number of reps)
-        num_reps = len(channel_activations_by_directory[0])
-
-        # Construct vectors for each rep in the current directory
-        for rep_index in range(num_reps):
-            vector_for_rep = [
-                np.mean(channel_activations[rep_index]) if channel_activations else 0
-                for channel_activations in channel_activations_by_directory
-            ]
-            vectors_per_rep.append(vector_for_rep)
-            directory_rep_info.append(
-                (directory_path, rep_index)
-            )  # Store the directory and rep info
+    across directories based on their activations.
+
+    All the pairwise correlations are computed at once (see `pearson_correlation_matrix`), and the
+    average is taken over the pairs of reps without NaN or inf values.
+
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+        exercise_name (str): Name of the exercise, used in the warnings.
+        rep_labels (list, optional): (participant, rep number) label of each rep, used in the warnings.
+        return_matrix (bool, optional): If True, also returns the (reps, reps) correlation matrix, e.g. to compare
+            the correlations within and between participants. Default is False.
+
+    Returns:
+        float or tuple: The average correlation, and the correlation matrix if `return_matrix` is True.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
 
     # Check and print vectors with NaN or inf values
-    for i, vec in enumerate(vectors_per_rep):
-        if np.any(np.isnan(vec)) or np.any(np.isinf(vec)):
-            directory, rep_index = directory_rep_info[i]
-            print(
-                f"Exercise: {exercise_name}, Directory: {directory}, Rep: {rep_index + 1} has problematic values: {vec}"
-            )
+    valid = _report_invalid_rep_vectors(vectors_per_rep, exercise_name, rep_labels)
+    if not np.all(valid):
+        print(
+            f"Pearson Coefficient: NaN or Infinity values found in {np.sum(~valid)} reps. Skipping these vectors."
+        )
 
-    # Compute correlations among vectors of reps
-    for i in range(len(vectors_per_rep)):
-        for j in range(i + 1, len(vectors_per_rep)):
-            if len(vectors_per_rep[i]) == len(
-                vectors_per_rep[j]
-            ):  # Ensure the vectors have the same length
-                # Check if either vector contains NaN or inf before correlation calculation
-                if (
-                    np.any(np.isnan(vectors_per_rep[i]))
-                    or np.any(np.isnan(vectors_per_rep[j]))
-                    or np.any(np.isinf(vectors_per_rep[i]))
-                    or np.any(np.isinf(vectors_per_rep[j]))
-                ):
-                    print(
-                        f"Pearson Coefficient: NaN or Infinity values found in vectors at indices {i} and/or {j}. Skipping these vectors."
-                    )
-                    continue
-                correlation, _ = pearsonr(vectors_per_rep[i], vectors_per_rep[j])
-                correlations.append(correlation)
-
-    return np.mean(correlations)
-
-
-def compute_icc_for_exercise(activations_by_directory, exercise_name):
-    """Calculate the ICC across repetitions of the same exercise based on their activations."""
-    data = []
-    row_labels = []
-    for (
-        directory_path,
-        channel_activations_by_directory,
-    ) in activations_by_directory.items():
-        # Number of reps (assuming all channels have the same number of reps)
-        num_reps = len(channel_activations_by_directory[0])
-        for rep_index in range(num_reps):
-            vector_for_rep = [
-                np.mean(channel_activations[rep_index]) if channel_activations else 0
-                for channel_activations in channel_activations_by_directory
-            ]
-            data.append(vector_for_rep)
-            row_labels.append(
-                f"{os.path.basename(directory_path).split('_')[0]}_Rep{rep_index+1}"
-            )
+    correlation_matrix = pearson_correlation_matrix(vectors_per_rep)
+    average_correlation = _average_over_pairs(correlation_matrix[np.ix_(valid, valid)])
 
-    # Naming the columns
-    num_channels = len(data[0])
-    column_names = [f"Channel_{i+1}" for i in range(num_channels)]
+    if return_matrix:
+        return average_correlation, correlation_matrix
+    return average_correlation
+
+
+def compute_icc2_1(ratings, rater_mask=None, confidence=None):
+    """Compute the two-way random effects, absolute agreement, single rater ICC(2,1).
+
+    The mean squares of the two-way ANOVA without replication are computed with array reductions, so several
+    datasets with the same number of raters and targets can be processed in one call by stacking them along
+    the leading axes. Datasets with fewer raters can be padded and the padding excluded with `rater_mask`.
+
+    Args:
+        ratings (np.array): (..., raters, targets) ratings, e.g. the (reps, channels) activations of an exercise.
+        rater_mask (np.array, optional): (..., raters) array, False for the raters to be ignored. Default is all the raters.
+        confidence (float, optional): Confidence level of the interval (e.g. 0.95). Default is no interval.
+
+    Returns:
+        np.array or tuple: The ICC(2,1) of each dataset (NaN with fewer than 2 raters or targets), and the lower and upper
+        bounds of the confidence interval if `confidence` is given.
+    """
+    ratings = np.asarray(ratings, dtype=float)
+    if rater_mask is None:
+        rater_mask = np.ones(ratings.shape[:-1], dtype=bool)
+    rater_mask = np.asarray(rater_mask, dtype=bool)
+    weights = rater_mask[..., None]
+    ratings = np.where(weights, ratings, 0.0)
+
+    n = ratings.shape[-1]  # Number of targets
+    k = np.sum(rater_mask, axis=-1)  # Number of raters
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grand_mean = np.sum(ratings, axis=(-2, -1)) / (k * n)
+        target_means = np.sum(ratings, axis=-2) / k[..., None]
+        rater_means = np.mean(ratings, axis=-1)
+
+        # Two-way ANOVA sums of squares
+        ss_targets = k * np.sum(
+            np.square(target_means - grand_mean[..., None]), axis=-1
+        )
+        ss_raters = n * np.sum(
+            rater_mask * np.square(rater_means - grand_mean[..., None]), axis=-1
+        )
+        ss_total = np.sum(
+            weights * np.square(ratings - grand_mean[..., None, None]), axis=(-2, -1)
+        )
+        ss_error = ss_total - ss_targets - ss_raters
+
+        ms_targets = ss_targets / (n - 1)
+        ms_raters = ss_raters / (k - 1)
+        ms_error = ss_error / ((n - 1) * (k - 1))
+
+        icc = (ms_targets - ms_error) / (
+            ms_targets + (k - 1) * ms_error + k * (ms_raters - ms_error) / n
+        )
+        icc = np.where((k > 1) & (n > 1), icc, np.nan)
+        if confidence is None:
+            return icc
+
+        # Confidence interval of McGraw and Wong (1996), with the Satterthwaite degrees of freedom
+        alpha = 1 - confidence
+        f_raters = ms_raters / ms_error
+        vn = (
+            (n - 1)
+            * (k - 1)
+            * (k * icc * f_raters + n * (1 + (k - 1) * icc) - k * icc) ** 2
+        )
+        vd = (n - 1) * k**2 * icc**2 * f_raters**2 + (
+            n * (1 + (k - 1) * icc) - k * icc
+        ) ** 2
+        v = vn / vd
+        f_upper = f_distribution.ppf(1 - alpha / 2, n - 1, v)
+        f_lower = f_distribution.ppf(1 - alpha / 2, v, n - 1)
+        lower = (
+            n
+            * (ms_targets - f_upper * ms_error)
+            / (f_upper * (k * ms_raters + (k * n - k - n) * ms_error) + n * ms_targets)
+        )
+        upper = (
+            n
+            * (f_lower * ms_targets - ms_error)
+            / (k * ms_raters + (k * n - k - n) * ms_error + n * f_lower * ms_targets)
+        )
+    return icc, lower, upper
+
+
+def compute_icc_for_exercise(
+    rep_vectors, exercise_name, rep_labels=None, confidence=None
+):
+    """Calculate the ICC across repetitions of the same exercise based on their activations.
 
-    df = pd.DataFrame(data, columns=column_names, index=row_labels)
-    # Reshaping the dataframe
-    df_melted = df.melt(
-        ignore_index=False, var_name="target", value_name="rating"
-    ).reset_index()
-    df_melted.columns = ["rater", "target", "rating"]
-    # print(f"Melted dataframe for exercise {exercise_name}")
-    # print(df_melted)
+    The reps are the raters and the channels the targets of the ICC(2,1), see `compute_icc2_1`. The reps with
+    NaN or inf values are left out.
 
-    # Compute the ICC
-    icc_results = pg.intraclass_corr(
-        data=df_melted, targets="target", raters="rater", ratings="rating"
-    ).round(3)
-    # print(f"\nICC results for exercise {exercise_name}:")
-    # print(icc_results)
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+        exercise_name (str): Name of the exercise, used in the warnings.
+        rep_labels (list, optional): (participant, rep number) label of each rep, used in the warnings.
+        confidence (float, optional): Confidence level of the interval (e.g. 0.95). Default is no interval.
 
-    # Extract ICC2 value from the results
-    icc2_value = icc_results.loc[icc_results["Type"] == "ICC2", "ICC"].values[0]
-    return icc2_value
+    Returns:
+        float or tuple: The ICC(2,1), and the lower and upper bounds of the confidence interval if `confidence` is given.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
+    valid = _report_invalid_rep_vectors(vectors_per_rep, exercise_name, rep_labels)
+    results = compute_icc2_1(vectors_per_rep[valid], confidence=confidence)
+    if confidence is None:
+        return float(results)
+    return tuple(float(value) for value in results)
+
+
+def compute_icc_for_exercises(activation_tensor, exercise_names=None, confidence=None):
+    """Calculate the ICC of several exercises in a single vectorized call.
+
+    For each exercise, all the recorded reps of all the participants of the tensor are the raters, as in
+    `compute_icc_for_exercise`. Missing reps and reps with NaN or inf values are masked.
+
+    Args:
+        activation_tensor (ActivationTensor): Activations of the participants.
+        exercise_names (list, optional): Names of the exercises. Default is all the exercises of the tensor.
+        confidence (float, optional): Confidence level of the interval (e.g. 0.95). Default is no interval.
+
+    Returns:
+        dict: Exercise names to their ICC(2,1), or to a (ICC, lower, upper) tuple if `confidence` is given.
+    """
+    tensor = activation_tensor
+    if exercise_names is None:
+        exercise_names = tensor.exercises
+    exercise_index = [tensor.exercises.index(name) for name in exercise_names]
+
+    num_channels = tensor.shape[-1]
+    # (exercise, participant * rep, channel) ratings
+    ratings = tensor.values[exercise_index].reshape(
+        len(exercise_index), -1, num_channels
+    )
+    rater_mask = tensor.mask[exercise_index].reshape(len(exercise_index), -1) & np.all(
+        np.isfinite(ratings), axis=-1
+    )
+
+    results = compute_icc2_1(ratings, rater_mask, confidence)
+    if confidence is None:
+        return {name: float(icc) for name, icc in zip(exercise_names, results)}
+    return {
+        name: tuple(float(value[i]) for value in results)
+        for i, name in enumerate(exercise_names)
+    }
 
 
 def cosine_similarity(v1, v2):
@@ -125,60 +236,103 @@ def cosine_similarity(v1, v2):
     return dot_product / (norm_v1 * norm_v2)
 
 
-def average_cosine_similarity_over_directories(activations_by_directory, exercise_name):
+def cosine_similarity_matrix(rep_vectors):
+    """Compute the cosine similarity between every pair of reps from their normalized Gram matrix.
+
+    The reps with NaN or inf values are masked before the computation, and their rows and columns are NaN.
+    The similarity with a zero vector is 0, as with `cosine_similarity`.
+
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+
+    Returns:
+        np.array: The symmetric (reps, reps) similarity matrix.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
+    valid = np.all(np.isfinite(vectors_per_rep), axis=1)
+    similarity_matrix = np.full((len(vectors_per_rep), len(vectors_per_rep)), np.nan)
+
+    valid_vectors = vectors_per_rep[valid]
+    norms = np.linalg.norm(valid_vectors, axis=1)
+    # Zero vectors are left as zeros, so their similarities are 0
+    unit_vectors = valid_vectors / np.where(norms == 0, 1.0, norms)[:, None]
+    similarity_matrix[np.ix_(valid, valid)] = unit_vectors @ unit_vectors.T
+    return similarity_matrix
+
+
+def average_cosine_similarity_over_directories(
+    rep_vectors, exercise_name, rep_labels=None, return_matrix=False
+):
     """Calculate the average cosine similarity between reps of the same exercise
-    across directories based on their activations."""
-
-    similarities = []
-
-    # List of 8-dimensional vectors for each rep in every directory
-    vectors_per_rep = []
-    directory_rep_info = []  # Store directory and rep index for each vector
-
-    # Loop over all directories (i.e., sessions or individuals)
-    for (
-        directory_path,
-        channel_activations_by_directory,
-    ) in activations_by_directory.items():
-        # Number of reps (assuming all channels have the same number of reps)
-        num_reps = len(channel_activations_by_directory[0])
-
-        # Construct vectors for each rep in the current directory
-        for rep_index in range(num_reps):
-            vector_for_rep = [
-                np.mean(channel_activations[rep_index]) if channel_activations else 0
-                for channel_activations in channel_activations_by_directory
-            ]
-            vectors_per_rep.append(vector_for_rep)
-            directory_rep_info.append(
-                (directory_path, rep_index)
-            )  # Store the directory and rep info
+    across directories based on their activations.
+
+    All the pairwise similarities are computed at once (see `cosine_similarity_matrix`), and the
+    average is taken over the pairs of reps without NaN or inf values.
+
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+        exercise_name (str): Name of the exercise, used in the warnings.
+        rep_labels (list, optional): (participant, rep number) label of each rep, used in the warnings.
+        return_matrix (bool, optional): If True, also returns the (reps, reps) similarity matrix. Default is False.
+
+    Returns:
+        float or tuple: The average similarity, and the similarity matrix if `return_matrix` is True.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
 
     # Check and print vectors with NaN or inf values
-    for i, vec in enumerate(vectors_per_rep):
-        if np.any(np.isnan(vec)) or np.any(np.isinf(vec)):
-            directory, rep_index = directory_rep_info[i]
-            print(
-                f"Exercise: {exercise_name}, Directory: {directory}, Rep: {rep_index + 1} has problematic values: {vec}"
-            )
+    valid = _report_invalid_rep_vectors(vectors_per_rep, exercise_name, rep_labels)
+    if not np.all(valid):
+        print(
+            f"Cosine Similarity: NaN or Infinity values found in {np.sum(~valid)} reps. Skipping these vectors."
+        )
+
+    similarity_matrix = cosine_similarity_matrix(vectors_per_rep)
+    average_similarity = _average_over_pairs(similarity_matrix[np.ix_(valid, valid)])
+
+    if return_matrix:
+        return average_similarity, similarity_matrix
+    return average_similarity
+
+
+def compute_similarity_metrics(
+    rep_vectors, exercise_name, rep_labels=None, confidence=None
+):
+    """Calculate all the similarity metrics between reps of the same exercise in one pass.
+
+    The (reps, channels) matrix is checked once, and the Pearson correlation, ICC(2,1) and cosine similarity
+    are then computed on the valid reps with matrix operations (see `pearson_correlation_matrix`,
+    `compute_icc2_1` and `cosine_similarity_matrix`). The results are the same as
+    `average_pearson_coefficient_over_directories`, `compute_icc_for_exercise` and
+    `average_cosine_similarity_over_directories`.
+
+    Args:
+        rep_vectors (np.array): (reps, channels) activations of all the reps, see `ActivationTensor.rep_matrix`.
+        exercise_name (str): Name of the exercise, used in the warnings.
+        rep_labels (list, optional): (participant, rep number) label of each rep, used in the warnings.
+        confidence (float, optional): Confidence level of the ICC interval (e.g. 0.95). Default is no interval.
+
+    Returns:
+        dict: The average "pearson" correlation, the "icc2" (a (ICC, lower, upper) tuple if `confidence` is given)
+        and the average "cosine" similarity.
+    """
+    vectors_per_rep = np.asarray(rep_vectors, dtype=float)
+
+    # Check and print vectors with NaN or inf values
+    valid = _report_invalid_rep_vectors(vectors_per_rep, exercise_name, rep_labels)
+    if not np.all(valid):
+        print(
+            f"Similarity metrics: NaN or Infinity values found in {np.sum(~valid)} reps. Skipping these vectors."
+        )
+    valid_vectors = vectors_per_rep[valid]
 
-    # Compute cosine similarities among vectors of reps
-    for i in range(len(vectors_per_rep)):
-        for j in range(i + 1, len(vectors_per_rep)):
-            if len(vectors_per_rep[i]) == len(
-                vectors_per_rep[j]
-            ):  # Ensure the vectors have the same length
-                if (
-                    np.any(np.isnan(vectors_per_rep[i]))
-                    or np.any(np.isnan(vectors_per_rep[j]))
-                    or np.any(np.isinf(vectors_per_rep[i]))
-                    or np.any(np.isinf(vectors_per_rep[j]))
-                ):
-                    print(
-                        f"Cosine Similarity: NaN or Infinity values found in vectors at indices {i} and/or {j}. Skipping these vectors."
-                    )
-                    continue
-                similarity = cosine_similarity(vectors_per_rep[i], vectors_per_rep[j])
-                similarities.append(similarity)
-
-    return np.mean(similarities)
+    correlation_matrix = pearson_correlation_matrix(valid_vectors)
+    cosine_matrix = cosine_similarity_matrix(valid_vectors)
+    icc = compute_icc2_1(valid_vectors, confidence=confidence)
+    return {
+        "pearson": _average_over_pairs(correlation_matrix),
+        "icc2": (
+            float(icc) if confidence is None else tuple(float(value) for value in icc)
+        ),
+        "cosine": _average_over_pairs(cosine_matrix),
+    }
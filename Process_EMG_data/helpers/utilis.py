@@ -1,5 +1,7 @@
 import os
 import re
+from collections import namedtuple
+from functools import lru_cache
 
 
 def get_mat_filenames(directory_path):
@@ -20,6 +22,76 @@ def get_mat_filenames(directory_path):
     return sorted(filenames)
 
 
+# Fields parsed from a recording filename such as "YT1_tadasana_01_02_2024_10_30_15_rep1.mat".
+# time and rep are None when they are not part of the filename.
+RecordingInfo = namedtuple(
+    "RecordingInfo", ["participant_type", "exercise_name", "date", "time", "rep"]
+)
+
+date_pattern = re.compile(r"\d{2}_\d{2}_\d{4}")
+time_pattern = re.compile(r"_(\d{2}_\d{2}_\d{2})")
+
+
+@lru_cache(maxsize=None)
+def _parse_basename(base_name):
+    """
+    Parse a recording filename (without directory), returning None if it does not contain a date.
+
+    The result is cached, since the same filenames are parsed many times by the analysis scripts.
+    """
+    match = date_pattern.search(base_name)
+    if not match:
+        return None
+
+    # Split the filename into parts before and after the date
+    before_date = base_name[: match.start()]
+    after_date = base_name[match.end() :]
+    participant_type = before_date.split("_")[0]
+    yoga_position = "_".join(before_date.split("_")[1:]).rstrip("_")
+
+    time_match = time_pattern.match(after_date)
+    time = time_match.group(1) if time_match else None
+    try:
+        rep = _parse_rep_number(base_name)
+    except ValueError:
+        rep = None
+
+    return RecordingInfo(participant_type, yoga_position, match.group(), time, rep)
+
+
+@lru_cache(maxsize=None)
+def _parse_rep_number(base_name):
+    """Extract the repetition number from a filename (without directory), caching the result."""
+    rep_num_str = base_name.split("_rep")[-1].split(".")[
+        0
+    ]  # Assuming the extension comes after "_repX"
+    return int(rep_num_str)
+
+
+def parse_recording_filename(filename):
+    """
+    Extracts the partecipant type, exercise name, date, time and repetition from the filename.
+
+    The function expects the filename to contain a date pattern in the format "\d{2}_\d{2}_\d{4}".
+
+    Args:
+    filename (str): The filename to be parsed.
+
+    Returns:
+    RecordingInfo: The parsed fields. The time and repetition are None if they are not in the filename.
+
+    Raises:
+    ValueError: If the date pattern is not found in the filename.
+    """
+    filename = os.path.basename(filename)
+    info = _parse_basename(filename)
+    if info is None:
+        raise ValueError(
+            f"Could not find the expected date pattern in the filename. Filename is {filename}"
+        )
+    return info
+
+
 def get_partecipant_type(filename):
     """
     Extracts the partecipant type from the filename.
@@ -36,14 +108,9 @@ def get_partecipant_type(filename):
     Raises:
     ValueError: If the date pattern is not found in the filename.
     """
-
-    filename = os.path.basename(filename)
-    match = re.search(r"\d{2}_\d{2}_\d{4}", filename)
-    if match:
-        # Split the filename into parts before and after the date
-        parts = filename.split(match.group())
-        participant_type = parts[0].split("_")[0]
-        return participant_type
+    info = _parse_basename(os.path.basename(filename))
+    if info:
+        return info.participant_type
 
     raise ValueError("Could not find the expected date pattern in the filename.")
 
@@ -64,19 +131,7 @@ def get_exercise_name(filename):
     Raises:
     ValueError: If the date pattern is not found in the filename.
     """
-    filename = os.path.basename(filename)
-    match = re.search(r"\d{2}_\d{2}_\d{4}", filename)
-    if match:
-        # Split the filename into parts before and after the date
-        parts = filename.split(match.group())
-        participant_type = parts[0].split("_")[0]
-        yoga_position = "_".join(parts[0].split("_")[1:]).rstrip("_")
-
-        return yoga_position
-
-    raise ValueError(
-        f"Could not find the expected date pattern in the filename. Filename is {filename}"
-    )
+    return parse_recording_filename(filename).exercise_name
 
 
 def get_channel_names(directory_path):
@@ -97,13 +152,14 @@ def get_channel_names(directory_path):
     return channel_names
 
 
-def trim_data(data, sampling_frequency):
+def trim_data(data, sampling_frequency, axis=-1):
     """
     Trim the data by removing the first and last second of the signal.
 
     Args:
-        data (np.array): The raw EMG data.
+        data (np.array): The raw EMG data, either a single channel or a (channels, samples) array.
         sampling_frequency (int): The sampling frequency of the signal.
+        axis (int, optional): Time axis of the data. Default is -1.
 
     Returns:
         data (np.array): The trimmed EMG data.
@@ -111,7 +167,9 @@ def trim_data(data, sampling_frequency):
     # Calculate the number of samples corresponding to one second
     samples_to_remove = int(sampling_frequency)
 
-    return data[samples_to_remove:-samples_to_remove]
+    index = [slice(None)] * data.ndim
+    index[axis] = slice(samples_to_remove, -samples_to_remove)
+    return data[tuple(index)]
 
 
 def get_rep_number(filename):
@@ -124,9 +182,4 @@ def get_rep_number(filename):
     Returns:
     - int: Repetition number extracted from the filename.
     """
-
-    base_name = os.path.basename(filename)
-    rep_num_str = base_name.split("_rep")[-1].split(".")[
-        0
-    ]  # Assuming the extension comes after "_repX"
-    return int(rep_num_str)
+    return _parse_rep_number(os.path.basename(filename))
@@ -1,17 +1,15 @@
 from collections import defaultdict
 from tkinter import filedialog, Tk
-from scipy.io import loadmat
 import os
 import numpy as np
 import pandas as pd
 
 from Process_EMG_data.helpers.mvc_processing import calculate_mvc_for_each_channel
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
+from Process_EMG_data.helpers.activation_engine import compute_exercise_envelopes
 from Process_EMG_data.helpers.amplifier_config import sampling_frequency
 from Process_EMG_data.helpers.utilis import (
     get_mat_filenames,
     get_channel_names,
-    get_exercise_name,
 )
 
 from matplotlib import pyplot as plt
@@ -52,27 +50,6 @@ def minimum_window_for_constant_std(data, relative_tolerance=1e-1):
     return None
 
 
-def compute_exercise_activations(filenames, channel_indices, mvc_values):
-    activations_per_exercise = defaultdict(lambda: [list() for _ in channel_indices])
-
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
-        exercise_name = get_exercise_name(os.path.basename(filename))
-
-        for channel_index in channel_indices:
-            processed_data = normalize_signal(
-                data[channel_index, :],
-                sampling_frequency,
-                mvc_values[channel_index],
-            )
-            activations_per_exercise[exercise_name][channel_index].append(
-                processed_data
-            )
-
-    return activations_per_exercise
-
-
 if __name__ == "__main__":
     root = Tk()
     root.withdraw()
@@ -86,7 +63,7 @@ if __name__ == "__main__":
 
     filenames = get_mat_filenames(directory_path)
 
-    activations_per_exercise = compute_exercise_activations(
+    activations_per_exercise = compute_exercise_envelopes(
         filenames, range(len(channel_names)), mvc_values
     )
 
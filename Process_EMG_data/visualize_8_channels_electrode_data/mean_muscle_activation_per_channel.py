@@ -1,12 +1,14 @@
 import numpy as np
-from scipy.io import loadmat
 import matplotlib.pyplot as plt
 from tkinter import filedialog
 from tkinter import Tk
 import os
 from collections import defaultdict
 from Process_EMG_data.helpers.mvc_processing import calculate_mvc_for_each_channel
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
+from Process_EMG_data.helpers.activation_statistics import (
+    compute_activation_statistics,
+)
+from Process_EMG_data.helpers.envelope_cache import iter_envelopes
 from Process_EMG_data.helpers.amplifier_config import (
     sampling_frequency,
 )
@@ -128,21 +130,13 @@ def compute_channel_mean_activations(filenames, channel_index, mvc_values):
     # Initialize dictionary to store mean muscle activation values per exercise
     activation_means_dict = defaultdict(list)
 
-    for filename in filenames:
-        # Load the data from the .mat file
-        mat_file = loadmat(filename)
-
-        # Extract the data
-        data = mat_file["data"]
+    # Load the envelopes of the recordings (cached on disk), reading the next ones in the background
+    for filename, envelope in iter_envelopes(filenames, sampling_frequency):
 
-        # Process the EMG data
-        processed_data = normalize_signal(
-            data[channel_index, :],
-            sampling_frequency,
-            mvc_values[channel_index],
-        )
-        # Compute the mean muscle activation for the selected channel
-        mean_activation = np.mean(processed_data)
+        # Compute the mean normalized muscle activation for the selected channel
+        mean_activation = compute_activation_statistics(
+            envelope[channel_index, :], mvc=mvc_values[channel_index]
+        )["mean"]
 
         # Extract the partecipant type and yoga position from the filename and store for labeling
         filename = os.path.basename(filename)
@@ -1,12 +1,14 @@
 from collections import defaultdict
 from tkinter import filedialog, Tk
-from scipy.io import loadmat
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 
 from Process_EMG_data.helpers.mvc_processing import calculate_mvc_for_each_channel
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
+from Process_EMG_data.helpers.activation_statistics import (
+    compute_activation_statistics,
+)
+from Process_EMG_data.helpers.envelope_cache import iter_envelopes
 from Process_EMG_data.helpers.amplifier_config import (
     sampling_frequency,
 )
@@ -93,26 +95,21 @@ def compute_exercise_mean_activations(filenames, channel_indices, mvc_values):
         mvc_values (list): List of MVC values for normalization.
 
     Returns:
-        dict: Dictionary mapping exercise names to their respective mean activations for each channel.
+        dict: Dictionary mapping exercise names to their respective mean activations for each selected channel, in the order of `channel_indices`.
     """
     activation_means_per_exercise = defaultdict(lambda: [0] * len(channel_indices))
 
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
+    for filename, envelope in iter_envelopes(filenames, sampling_frequency):
 
         exercise_name = get_exercise_name(os.path.basename(filename))
 
-        for channel_index in channel_indices:
-            processed_data = normalize_signal(
-                data[channel_index, :],
-                sampling_frequency,
-                mvc_values[channel_index],
-            )
-            mean_activation = np.mean(processed_data)
-            activation_means_per_exercise[exercise_name][
-                channel_index
-            ] = mean_activation
+        # Reduce all the channels of the recording to their mean normalized activation
+        channel_list = list(channel_indices)
+        mean_activations = compute_activation_statistics(
+            envelope[channel_list, :], mvc=np.asarray(mvc_values)[channel_list]
+        )["mean"]
+        for row in range(len(channel_list)):
+            activation_means_per_exercise[exercise_name][row] = mean_activations[row]
 
     return activation_means_per_exercise
 
@@ -1,15 +1,11 @@
 import numpy as np
-from scipy.io import loadmat
 import matplotlib.pyplot as plt
 from tkinter import filedialog
 from tkinter import Tk
 import os
 from collections import defaultdict
 from Process_EMG_data.helpers.mvc_processing import calculate_mvc_for_each_channel
-from Process_EMG_data.helpers.apply_processing_pipeline import (
-    normalize_signal,
-    extract_envelope,
-)
+from Process_EMG_data.helpers.envelope_cache import iter_envelopes
 from Process_EMG_data.helpers.amplifier_config import (
     sampling_frequency,
 )
@@ -147,15 +143,8 @@ def compute_channel_mean_activations(filenames, channel_index, mvc_values):
     """
     activation_reps_dict = defaultdict(list)
 
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
-
-        processed_data = extract_envelope(
-            data[channel_index, :],
-            sampling_frequency,
-            # mvc_values[channel_index],
-        )
+    for filename, envelope in iter_envelopes(filenames, sampling_frequency):
+        processed_data = envelope[channel_index, :]
 
         mean_activation = np.mean(processed_data)
 
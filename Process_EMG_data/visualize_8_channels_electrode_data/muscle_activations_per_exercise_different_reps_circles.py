@@ -1,6 +1,4 @@
-from collections import defaultdict
 from tkinter import filedialog, Tk
-from scipy.io import loadmat
 import os
 import numpy as np
 import matplotlib.pyplot as plt
@@ -10,14 +8,11 @@ from Process_EMG_data.helpers.mvc_processing import (
     plot_mvc_mapping_table,
     use_automatic,
 )
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
-from Process_EMG_data.helpers.amplifier_config import (
-    sampling_frequency,
-)
+from Process_EMG_data.helpers.activation_statistics import apply_mvc_normalization
+from Process_EMG_data.helpers.activation_engine import compute_exercise_activations
 from Process_EMG_data.helpers.utilis import (
     get_mat_filenames,
     get_partecipant_type,
-    get_exercise_name,
     get_channel_names,
 )
 
@@ -117,39 +112,6 @@ def plot_muscle_activation_per_exercise_different_reps(
     fig.write_html(plot_filename)
 
 
-def compute_exercise_activations(filenames, channel_indices, mvc_values):
-    """
-    Compute activations for each exercise based on the given filenames.
-
-    Parameters:
-    - filenames (list): List of filenames containing exercise data.
-    - channel_indices (list): List of indices corresponding to channels.
-    - mvc_values (list): Maximum voluntary contraction values for each channel.
-
-    Returns:
-    - activations_per_exercise (dict): A dictionary containing activations for each exercise.
-    """
-
-    activations_per_exercise = defaultdict(lambda: [list() for _ in channel_indices])
-
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
-        exercise_name = get_exercise_name(os.path.basename(filename))
-
-        for channel_index in channel_indices:
-            processed_data = normalize_signal(
-                data[channel_index, :],
-                sampling_frequency,
-                mvc_values[channel_index],
-            )
-            activations_per_exercise[exercise_name][channel_index].append(
-                processed_data
-            )
-
-    return activations_per_exercise
-
-
 if __name__ == "__main__":
     root = Tk()
     root.withdraw()
@@ -184,8 +146,9 @@ if __name__ == "__main__":
         filenames = get_mat_filenames(directory_path)
         participant_type = get_partecipant_type(filenames[0])
 
-        activations_per_exercise = compute_exercise_activations(
-            filenames, range(len(channel_names)), mvc_values
+        activations_per_exercise = apply_mvc_normalization(
+            compute_exercise_activations(filenames, range(len(channel_names))),
+            mvc_values,
         )
 
         # Sort channel names and reorder related data right before plotting
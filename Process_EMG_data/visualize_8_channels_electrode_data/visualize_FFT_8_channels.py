@@ -1,11 +1,11 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.io import loadmat
 from tkinter import filedialog
 from tkinter import Tk
 import os
 import re
 from Process_EMG_data.helpers.utilis import get_channel_names
+from Process_EMG_data.helpers.recording_reader import load_recording
 
 if __name__ == "__main__":
     # Hide the main tkinter window
@@ -35,8 +35,7 @@ if __name__ == "__main__":
         print("Could not find a date in the filename.")
 
     # Load the data from the .mat file
-    mat = loadmat(file_path)
-    data = mat["data"]
+    data = load_recording(file_path)
 
     # Number of channels to plot
     num_channels_to_plot = len(channel_names)
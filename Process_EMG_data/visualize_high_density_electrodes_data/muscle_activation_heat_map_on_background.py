@@ -1,16 +1,13 @@
 from collections import defaultdict
 from tkinter import filedialog, Tk
-from scipy.io import loadmat
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
-from Process_EMG_data.helpers.amplifier_config import sampling_frequency
+from Process_EMG_data.helpers.activation_engine import compute_exercise_activations
 from Process_EMG_data.helpers.utilis import (
     get_mat_filenames,
     get_partecipant_type,
-    get_exercise_name,
 )
 
 from matplotlib.transforms import Affine2D
@@ -112,38 +109,6 @@ def plot_combined_heatmap_on_bg(
     plt.close()
 
 
-def compute_exercise_activations(filenames, channel_indices, mvc_values):
-    """
-    Compute muscle activations for exercises from provided files.
-
-    Parameters:
-    - filenames (list of str): List of paths to the .mat files.
-    - channel_indices (list of int): List of channel indices to compute activations for.
-    - mvc_values (list of float): List of maximum voluntary contraction values.
-
-    Returns:
-    - defaultdict: Dictionary with exercise names as keys and a list of activations for each channel as values.
-    """
-    activations_per_exercise = defaultdict(lambda: [list() for _ in channel_indices])
-
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
-        exercise_name = get_exercise_name(os.path.basename(filename))
-
-        for channel_index in channel_indices:
-            processed_data = normalize_signal(
-                data[channel_index, :],
-                sampling_frequency,
-                mvc_values[channel_index],
-            )
-            activations_per_exercise[exercise_name][channel_index].append(
-                processed_data
-            )
-
-    return activations_per_exercise
-
-
 def get_gridwise_max(activations_per_exercise, grids):
     """
     Get the 95th percentile of activations for each grid.
@@ -190,13 +155,11 @@ if __name__ == "__main__":
         title="Select directory with exercise data"
     )
 
-    mvc_values = [1] * 64  # Assigning all 64 values to 1 to avoid normalization
-
     filenames = get_mat_filenames(directory_path)
     participant_type = get_partecipant_type(filenames[0])
 
     activations_per_exercise = compute_exercise_activations(
-        filenames, range(64), mvc_values  # Assuming 64 channels in total
+        filenames, range(64)  # Assuming 64 channels in total
     )
 
     grids = [
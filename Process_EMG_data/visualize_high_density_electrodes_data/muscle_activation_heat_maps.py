@@ -1,16 +1,13 @@
 from collections import defaultdict
 from tkinter import filedialog, Tk
-from scipy.io import loadmat
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-from Process_EMG_data.helpers.apply_processing_pipeline import normalize_signal
-from Process_EMG_data.helpers.amplifier_config import sampling_frequency
+from Process_EMG_data.helpers.activation_engine import compute_exercise_activations
 from Process_EMG_data.helpers.utilis import (
     get_mat_filenames,
     get_partecipant_type,
-    get_exercise_name,
 )
 
 
@@ -103,38 +100,6 @@ def plot_combined_heatmap(
     plt.close()
 
 
-def compute_exercise_activations(filenames, channel_indices, mvc_values):
-    """
-    Compute muscle activations for the exercises in the given filenames.
-
-    Parameters:
-        - filenames (list): List of file paths containing exercise data.
-        - channel_indices (list): Indices of the channels to consider.
-        - mvc_values (list): List of Maximum Voluntary Contraction (MVC) values for all channels.
-
-    Returns:
-        defaultdict: A dictionary with exercise names as keys and activations as values.
-    """
-    activations_per_exercise = defaultdict(lambda: [list() for _ in channel_indices])
-
-    for filename in filenames:
-        mat_file = loadmat(filename)
-        data = mat_file["data"]
-        exercise_name = get_exercise_name(os.path.basename(filename))
-
-        for channel_index in channel_indices:
-            processed_data = normalize_signal(
-                data[channel_index, :],
-                sampling_frequency,
-                mvc_values[channel_index],
-            )
-            activations_per_exercise[exercise_name][channel_index].append(
-                processed_data
-            )
-
-    return activations_per_exercise
-
-
 if __name__ == "__main__":
     root = Tk()
     root.withdraw()
@@ -143,13 +108,11 @@ if __name__ == "__main__":
         title="Select directory with exercise data"
     )
 
-    mvc_values = [1] * 64  # Assigning all 64 values to 1
-
     filenames = get_mat_filenames(directory_path)
     participant_type = get_partecipant_type(filenames[0])
 
     activations_per_exercise = compute_exercise_activations(
-        filenames, range(64), mvc_values  # Assuming 64 channels in total
+        filenames, range(64)  # Assuming 64 channels in total
     )
 
     grids = [
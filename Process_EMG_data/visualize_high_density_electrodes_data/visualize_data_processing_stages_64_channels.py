@@ -1,6 +1,5 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.io import loadmat
 from tkinter import filedialog
 from tkinter import Tk
 import os
@@ -10,17 +9,11 @@ import sys
 
 print(sys.path)
 
-from Process_EMG_data.helpers.filtering import (
-    butter_bandpass_filter,
-    notch_mains_interference,
-)
-from Process_EMG_data.helpers.rectify_signal import rectify_signal
 from Process_EMG_data.helpers.amplifier_config import (
-    highcut,
-    lowcut,
     sampling_frequency,
 )
-from Process_EMG_data.helpers.apply_processing_pipeline import extract_envelope
+from Process_EMG_data.helpers.processing_graph import ProcessingGraph
+from Process_EMG_data.helpers.recording_reader import load_recording
 import gc  # import garbage collector
 
 
@@ -112,20 +105,13 @@ if __name__ == "__main__":
 
         rep_number = int(rep_match.group(1)) if rep_match else None
 
-        mat = loadmat(file_path)
-        raw_data = mat["data"]
-        del mat
-
-        # Filter the raw data
-        filtered_data = butter_bandpass_filter(
-            raw_data, lowcut, highcut, sampling_frequency
-        )
-        filtered_data = notch_mains_interference(
-            filtered_data, mains_freq=50, sampling_frequency=sampling_frequency
-        )
+        raw_data = load_recording(file_path)
 
-        # Extract the envelope of the filtered data
-        envelope_data = extract_envelope(raw_data, sampling_frequency)
+        # Filter the raw data and extract the envelope from the same filtered data
+        processing_graph = ProcessingGraph(raw_data, sampling_frequency)
+        filtered_data = processing_graph["notch_filtered"]
+        envelope_data = processing_graph["envelope"]
+        processing_graph.release("trimmed", "bandpassed", "rectified")
 
         channels_per_plot = 8
 
@@ -163,5 +149,5 @@ if __name__ == "__main__":
                 rep_number,
             )
 
-        del raw_data, filtered_data, envelope_data
+        del raw_data, filtered_data, envelope_data, processing_graph
         gc.collect()
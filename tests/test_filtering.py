@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy.signal import butter, iirnotch, lfilter
+
+from Process_EMG_data.helpers.amplifier_config import (
+    envelope_cutoff,
+    highcut,
+    lowcut,
+    mains_frequency,
+    sampling_frequency,
+)
+from Process_EMG_data.helpers.filtering import (
+    butter_bandpass_filter,
+    butter_lowpass_filter,
+    notch_mains_interference,
+)
+
+
+@pytest.fixture
+def signal():
+    """Ten seconds of random EMG-like signal with mains interference, on two channels."""
+    rng = np.random.default_rng(0)
+    time = np.arange(10 * sampling_frequency) / sampling_frequency
+    noise = rng.normal(scale=1e-4, size=(2, time.size))
+    return noise + 5e-5 * np.sin(2 * np.pi * mains_frequency * time)
+
+
+def assert_matches_baseline(filtered, baseline):
+    """Check the SOS output against the transfer function output, relative to the signal amplitude."""
+    np.testing.assert_allclose(
+        filtered, baseline, rtol=0, atol=1e-6 * np.max(np.abs(baseline))
+    )
+
+
+def test_bandpass_matches_lfilter(signal):
+    nyquist = 0.5 * sampling_frequency
+    b, a = butter(5, [lowcut / nyquist, highcut / nyquist], btype="band")
+    assert_matches_baseline(
+        butter_bandpass_filter(signal, lowcut, highcut, sampling_frequency),
+        lfilter(b, a, signal),
+    )
+
+
+def test_notch_matches_lfilter(signal):
+    b, a = iirnotch(mains_frequency / (0.5 * sampling_frequency), Q=30)
+    assert_matches_baseline(
+        notch_mains_interference(signal, mains_frequency, sampling_frequency),
+        lfilter(b, a, signal),
+    )
+
+
+def test_lowpass_matches_lfilter(signal):
+    rectified = np.abs(signal)
+    b, a = butter(5, envelope_cutoff / (0.5 * sampling_frequency), btype="low")
+    assert_matches_baseline(
+        butter_lowpass_filter(rectified, envelope_cutoff, sampling_frequency),
+        lfilter(b, a, rectified),
+    )
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+from scipy.io import savemat
+
+from Process_EMG_data.helpers.amplifier_config import sampling_frequency
+from Process_EMG_data.helpers.mvc_processing import (
+    calculate_mvc_for_each_channel,
+    calculate_mvc_windows,
+    compute_mvc_score_matrix,
+)
+
+channel_names = ["Deltoid", "Biceps", "Triceps", "Trapezius"]
+short_mvc_filename = "YT1_MVC_Deltoid_01_02_2024_10_30_15_rep1.mat"
+
+
+def make_session(directory_path, include_short_file):
+    """Write a synthetic MVC session, optionally with an aborted recording shorter than the MVC window."""
+    os.makedirs(directory_path)
+    with open(os.path.join(directory_path, "channel_config.txt"), "w") as file:
+        file.write("\n".join(channel_names))
+
+    rng = np.random.default_rng(0)
+    for i, muscle in enumerate(channel_names):
+        # Each recording has a strong contraction on its own muscle
+        data = rng.normal(scale=1e-4, size=(len(channel_names), 5 * sampling_frequency))
+        data[i, 2 * sampling_frequency : 3 * sampling_frequency] *= 10
+        filename = f"YT1_MVC_{muscle}_01_02_2024_10_30_15_rep2.mat"
+        savemat(os.path.join(directory_path, filename), {"data": data})
+
+    if include_short_file:
+        data = rng.normal(scale=1e-2, size=(len(channel_names), 600))
+        savemat(os.path.join(directory_path, short_mvc_filename), {"data": data})
+
+
+def test_short_mvc_file_is_never_selected(tmp_path):
+    session_path = os.path.join(tmp_path, "YT1_testing_1_MAT")
+    reference_path = os.path.join(tmp_path, "YT1_testing_2_MAT")
+    make_session(session_path, include_short_file=True)
+    make_session(reference_path, include_short_file=False)
+
+    scores, _, mvc_filenames = compute_mvc_score_matrix(session_path, max_workers=1)
+    assert np.all(scores[mvc_filenames.index(short_mvc_filename)] == -np.inf)
+    assert np.all(
+        np.isfinite(np.delete(scores, mvc_filenames.index(short_mvc_filename), axis=0))
+    )
+
+    mvc_values, sources = calculate_mvc_for_each_channel(
+        session_path, use_automatic=True, use_cache=False
+    )
+    expected_mvc_values, expected_sources = calculate_mvc_for_each_channel(
+        reference_path, use_automatic=True, use_cache=False
+    )
+    np.testing.assert_allclose(mvc_values, expected_mvc_values)
+    assert sources == expected_sources
+
+
+def test_mvc_window_longer_than_data_raises_by_default():
+    data = np.ones((2, 100))
+    with pytest.raises(ValueError):
+        calculate_mvc_windows(data, sampling_frequency)
+
+    mvc_values, window_starts = calculate_mvc_windows(
+        data, sampling_frequency, allow_short=True
+    )
+    assert np.all(mvc_values == -np.inf)
+    assert np.all(window_starts == 0)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Process_EMG_data.helpers.similarity_metrics import (
+    compute_icc2_1,
+    compute_icc_for_exercise,
+)
+
+pg = pytest.importorskip("pingouin")
+
+
+def pingouin_icc2_1(ratings):
+    """ICC(2,1) and its 95% confidence interval of a (raters, targets) matrix computed by pingouin."""
+    num_raters, num_targets = ratings.shape
+    data = pd.DataFrame(
+        {
+            "rater": np.repeat(np.arange(num_raters), num_targets),
+            "target": np.tile(np.arange(num_targets), num_raters),
+            "rating": ratings.ravel(),
+        }
+    )
+    icc = pg.intraclass_corr(data, targets="target", raters="rater", ratings="rating")
+    # pingouin < 0.7 labels ICC(2,1) "ICC2", later versions "ICC(A,1)"
+    row = icc[icc["Type"].isin(["ICC2", "ICC(A,1)"])].iloc[0]
+    return row["ICC"], row["CI95%"] if "CI95%" in row else row["CI95"]
+
+
+@pytest.mark.parametrize("shape", [(5, 8), (12, 3), (30, 10)])
+def test_icc2_1_matches_pingouin(shape):
+    rng = np.random.default_rng(sum(shape))
+    num_raters, num_targets = shape
+    # Targets with distinct true values, rated with noise and a bias per rater
+    ratings = (
+        2 * rng.normal(size=num_targets)
+        + rng.normal(size=(num_raters, 1))
+        + rng.normal(size=shape)
+    )
+
+    icc, lower, upper = compute_icc2_1(ratings, confidence=0.95)
+    expected_icc, expected_interval = pingouin_icc2_1(ratings)
+
+    np.testing.assert_allclose(icc, expected_icc, rtol=1e-10)
+    # pingouin rounds the confidence interval to 2 decimals
+    np.testing.assert_allclose([lower, upper], expected_interval, atol=0.005 + 1e-9)
+
+
+def test_icc_skips_reps_with_nan_like_pingouin_on_valid_reps():
+    rng = np.random.default_rng(0)
+    rep_vectors = rng.normal(size=8) + rng.normal(scale=0.5, size=(10, 8))
+    rep_vectors[[2, 7]] = np.nan
+    rep_vectors[4, 3] = np.inf
+
+    valid_reps = np.all(np.isfinite(rep_vectors), axis=1)
+    expected_icc, _ = pingouin_icc2_1(rep_vectors[valid_reps])
+
+    np.testing.assert_allclose(
+        compute_icc_for_exercise(rep_vectors, "exercise"), expected_icc, rtol=1e-10
+    )
+
+
+def test_batched_icc2_1_with_mask_matches_pingouin():
+    rng = np.random.default_rng(1)
+    ratings = rng.normal(size=(3, 1, 6)) + rng.normal(scale=0.8, size=(3, 10, 6))
+    rater_mask = np.ones((3, 10), dtype=bool)
+    rater_mask[1, 7:] = False
+    rater_mask[2, ::2] = False
+
+    icc = compute_icc2_1(ratings, rater_mask)
+
+    for i in range(len(ratings)):
+        expected_icc, _ = pingouin_icc2_1(ratings[i][rater_mask[i]])
+        np.testing.assert_allclose(icc[i], expected_icc, rtol=1e-10)